@@ -0,0 +1,233 @@
+"""
+Benchmark suite of the pymock pipeline
+======================================
+
+Times the parsing of the bundled ISIDE test catalog, single and multi window
+forecasts (across n_sims, mag_min and distributions) and the forecast
+writers, and writes the results as JSON. Runs offline, from any directory:
+
+    $ python benchmarks/run_benchmarks.py --output results.json
+
+Two runs (e.g. of two releases) are compared with --compare, which lists the
+benchmarks that slowed down by more than --tolerance, and exits with an error
+if there is any:
+
+    $ python benchmarks/run_benchmarks.py --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymock import libs, main  # noqa: E402
+from pymock.catalog import CatalogIndex  # noqa: E402
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                            'artifacts', 'iside_tests')
+START_DATE = datetime(2016, 11, 5)
+
+
+def timeit(func, repeat):
+    """
+    Calls func repeat times, returning its timings and last output
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):  # forecast logs
+            start = time.perf_counter()
+            output = func()
+            timings.append(time.perf_counter() - start)
+    return timings, output
+
+
+def benchmark(results, name, func, repeat, n_items=None, **params):
+    """
+    Times a benchmark and adds its entry to the results. If n_items is a
+    callable, it is given the output of func to count the processed items
+    (events, catalogs), and the throughput is also reported.
+    """
+    timings, output = timeit(func, repeat)
+    entry = {'name': name, 'params': params, 'repeat': repeat,
+             'seconds_min': min(timings),
+             'seconds_median': statistics.median(timings)}
+    if n_items is not None:
+        entry['n_items'] = n_items(output)
+        entry['items_per_second'] = entry['n_items'] / max(min(timings),
+                                                           1e-9)
+    results.append(entry)
+    print(f"{name:<20} {json.dumps(params):<50} "
+          f"{entry['seconds_min'] * 1e3:10.2f} ms")
+    return output
+
+
+def window_args(mag_min, distribution='poisson'):
+    return {'start_date': START_DATE,
+            'end_date': START_DATE + timedelta(days=1),
+            'mag_min': mag_min, 'distribution': distribution}
+
+
+def run_benchmarks(repeat=5, quick=False):
+    """
+    Runs all the benchmarks
+
+    Args:
+        repeat (int): Number of timings of each benchmark
+        quick (bool): Smaller sizes, to check the suite itself
+
+    Returns:
+        A list with the entry of each benchmark
+    """
+    results = []
+    n_sims_list = (100, 1000) if quick else (100, 1000, 10000)
+    n_windows = 10 if quick else 365
+
+    # Parsing
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, 'catalog.csv')
+        shutil.copy(CATALOG_PATH, path)
+        benchmark(results, 'parse', lambda: libs.load_cat(path), repeat,
+                  len, reader='load_cat')
+        benchmark(results, 'parse', lambda: libs.load_catalog(path,
+                                                              cache=False),
+                  repeat, len, reader='load_catalog')
+        libs.load_catalog(path)  # writes the cache
+        benchmark(results, 'parse', lambda: libs.load_catalog(path), repeat,
+                  len, reader='load_catalog_cached')
+    finally:
+        shutil.rmtree(tmp)
+
+    catalog = libs.load_catalog(CATALOG_PATH, cache=False)
+    index = CatalogIndex(catalog)
+    benchmark(results, 'index', lambda: CatalogIndex(catalog), repeat, len)
+
+    # Single window forecasts
+    for distribution in ('poisson', 'negbinom'):
+        for mag_min in (3.0, 4.0):
+            for n_sims in n_sims_list:
+                benchmark(results, 'forecast',
+                          lambda: main.make_forecast(
+                              index, window_args(mag_min, distribution),
+                              n_sims, seed=1, verbose=False,
+                              as_catalog=True),
+                          repeat, len, engine='vectorized',
+                          distribution=distribution, mag_min=mag_min,
+                          n_sims=n_sims)
+    benchmark(results, 'forecast',
+              lambda: main.make_forecast(index, window_args(3.0), 100, seed=1,
+                                         verbose=False, engine='legacy'),
+              repeat, len, engine='legacy', distribution='poisson',
+              mag_min=3.0, n_sims=100)
+
+    # Multi window forecasts
+    windows = libs.forecast_windows(START_DATE,
+                                    START_DATE + timedelta(days=n_windows))
+    for distribution in ('poisson', 'negbinom'):
+        benchmark(results, 'forecast_windows',
+                  lambda: main.make_forecasts(
+                      index, {'mag_min': 3.0, 'distribution': distribution},
+                      windows, 100, seed=1, as_catalog=True),
+                  repeat, lambda x: sum(len(i) for i in x),
+                  distribution=distribution, mag_min=3.0, n_sims=100,
+                  n_windows=len(windows))
+        benchmark(results, 'rates_windows',
+                  lambda: main.make_window_rates(
+                      index, {'mag_min': 3.0, 'distribution': distribution},
+                      windows, 1000, seed=1),
+                  repeat, lambda x: x.size, distribution=distribution,
+                  mag_min=3.0, n_sims=1000, n_windows=len(windows))
+
+    # Writers
+    with contextlib.redirect_stdout(io.StringIO()):
+        forecast = main.make_forecast(index, window_args(3.0),
+                                      n_sims_list[-1], seed=1, verbose=False,
+                                      as_catalog=True)
+    tmp = tempfile.mkdtemp()
+    try:
+        for fmt in libs.FORECAST_FORMATS:
+            benchmark(results, 'write',
+                      lambda: libs.write_forecast(START_DATE, START_DATE,
+                                                  forecast, tmp, fmt=fmt),
+                      repeat, lambda _: len(forecast), fmt=fmt)
+        events = forecast.to_list()
+        benchmark(results, 'write',
+                  lambda: libs.write_forecast(START_DATE, START_DATE, events,
+                                              tmp),
+                  repeat, lambda _: len(events), fmt='csv_list')
+    finally:
+        shutil.rmtree(tmp)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the benchmarks whose minimum time is larger than in the baseline
+    by more than the tolerance (relative)
+    """
+    def key(entry):
+        return entry['name'], json.dumps(entry['params'], sort_keys=True)
+
+    reference = {key(i): i for i in baseline['benchmarks']}
+    slowdowns = []
+    for entry in results['benchmarks']:
+        ref = reference.get(key(entry))
+        if ref is None:
+            continue
+        ratio = entry['seconds_min'] / max(ref['seconds_min'], 1e-9)
+        if ratio > 1 + tolerance:
+            slowdowns.append({'name': entry['name'],
+                              'params': entry['params'], 'ratio': ratio})
+    return slowdowns
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks of the pymock pipeline.')
+    parser.add_argument('--output', default=None,
+                        help='JSON file of the results')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timings per benchmark (the minimum is kept)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Smaller sizes, to check the suite itself')
+    parser.add_argument('--compare', default=None,
+                        help='JSON results of a previous run to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown reported by --compare')
+    options = parser.parse_args()
+
+    results = {'meta': {'date': datetime.now().isoformat(),
+                        'python': platform.python_version(),
+                        'numpy': numpy.__version__,
+                        'platform': platform.platform(),
+                        'repeat': options.repeat, 'quick': options.quick},
+               'benchmarks': run_benchmarks(options.repeat, options.quick)}
+
+    if options.output:
+        with open(options.output, 'w') as f_:
+            json.dump(results, f_, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f_:
+            slowdowns = compare(results, json.load(f_), options.tolerance)
+        for i in slowdowns:
+            print(f"Slower: {i['name']} {json.dumps(i['params'])} "
+                  f"x{i['ratio']:.2f}")
+        if slowdowns:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
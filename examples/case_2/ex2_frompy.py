@@ -9,7 +9,8 @@ This example demonstrates an illustrative case to run the model sequentially.
 Overview:
     1. Define the model arguments in a python script
     2. Creates multiple start dates
-    2. Run the model passing a random seed value (derived from the main seed)
+    2. Run the model for all the windows at once, in rates-only mode (see
+       make_window_rates)
     3. Get the mean rate from synthetic catalogs and plot against events
 """
 
@@ -18,72 +19,55 @@ Overview:
 # -----------------------
 
 import numpy
+import os
 import time
 from datetime import datetime, timedelta
-from pymock.main import make_forecast
-from pymock.libs import load_cat, write_forecast
+from pymock.main import make_window_rates
+from pymock.catalog import CatalogIndex
+from pymock.evaluation import observed_counts
+from pymock.libs import load_catalog, forecast_windows
 from matplotlib import pyplot
 
 ###############################################################################
 # Define forecast parameters
 # --------------------------
-catalog = load_cat('input/iside')
+catalog = CatalogIndex(load_catalog('input/iside'))
 start_date = datetime(2010, 1, 1)
 
 n_days = 365
-forecast_windows = [(start_date + timedelta(i),
-                     start_date + timedelta(i + 1)) for i in range(n_days)]
+windows = forecast_windows(start_date, start_date + timedelta(n_days))
 
 n_sims = 100
 seed = 23
-numpy.random.seed(seed)
+args = {'mag_min': 4.0}
 
 ###############################################################################
 # Run simulations
 # ---------------
 stime = time.perf_counter()
-daily_forecasts = []
 
-for start, end in forecast_windows:
-    args = {
-        'start_date': start,  # To be updated for every window
-        'end_date': end,
-        'mag_min': 4.0,
-    }
-    day = make_forecast(input_catalog=catalog,
-                        args=args,
-                        n_sims=n_sims,
-                        # a different seed for each day, which is
-                        # derived from the main seed (23).
-                        seed=numpy.random.randint(1, 10000),
-                        verbose=False)
-
-    # Uncomment to store forecast
-    # write_forecast(start, end, day, './forecasts/')
-
-    daily_forecasts.append(day)
+# Only the number of events of each synthetic catalog is needed for the mean
+# rates, so the events themselves are not simulated. The catalog is indexed
+# once and shared by all the windows (see make_forecasts to get the synthetic
+# catalogs instead).
+daily_counts = make_window_rates(input_catalog=catalog,
+                                 args=args,
+                                 windows=windows,
+                                 n_sims=n_sims,
+                                 seed=seed)
 
 print(f'Run-Time: {time.perf_counter() - stime:1f}')
 
 #############################################################################
 # Calculate the mean rate from synthetic catalogs and plot them all together
 # --------------------------------------------------------------------------
-catalog = [i for i in catalog if i[2] >= args['mag_min']]
-cat_events = []
-forecast_avg = []
-
-for window, forecast in zip(forecast_windows, daily_forecasts):
-    # Get forecast mean rates
-    cat_ids = [i[5] for i in forecast]
-    avg_events = len(forecast) / n_sims
-    forecast_avg.append(avg_events)
-
-    # Get observed events
-    day_cat = [i for i in catalog if window[0] <= i[3] < window[1]]
-    cat_events.append(len(day_cat))
+# Get forecast mean rates
+forecast_avg = daily_counts.mean(axis=1)
 
-cat_events = numpy.array(cat_events)
-issued_dates = numpy.array([i[0] for i in forecast_windows])
+# Get observed events (counted for all the windows at once, by binary search
+# on the indexed catalog)
+cat_events = observed_counts(catalog, windows, args['mag_min'])
+issued_dates = numpy.array([i[0] for i in windows])
 
 # Plot
 pyplot.title('pyMock - Mean rate')
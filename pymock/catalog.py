@@ -0,0 +1,392 @@
+from datetime import datetime, timedelta
+
+import numpy
+
+EPOCH = datetime(1970, 1, 1)
+DAY_US = 86400 * 10 ** 6
+
+
+def datetime_to_epoch(time):
+    """
+    Converts a datetime (or a sequence of them) into integer microseconds
+    since 1970-01-01 (naive datetimes are taken as they are, i.e. UTC)
+    """
+    if isinstance(time, datetime):
+        return (time - EPOCH) // (datetime.resolution)
+    return numpy.asarray(time, dtype='datetime64[us]').astype(numpy.int64)
+
+
+def epoch_to_datetime(epoch):
+    """
+    Converts integer microseconds since 1970-01-01 into datetime objects.
+    Returns a single datetime for a scalar input, or a list otherwise.
+    """
+    return numpy.asarray(epoch, dtype=numpy.int64).astype(
+        'datetime64[us]').astype(object).tolist()
+
+
+class Catalog:
+    """
+    Columnar representation of a CSEP formatted catalog.
+
+    Each attribute is a numpy array with one element per event:
+        lon, lat, mag, depth (float64): location and magnitude
+        time (int64): origin time in microseconds since 1970-01-01
+        catalog_id, event_id (int64): CSEP catalog and event ids
+
+    Events are selected by indexing the catalog with a slice (a view of the
+    arrays), a boolean mask or an array of indices, e.g.:
+        catalog[catalog.mag >= 4.0]
+    whereas an integer index (or iterating the catalog) returns events in
+    the legacy list format (see to_list).
+    """
+
+    columns = ('lon', 'lat', 'mag', 'time', 'depth', 'catalog_id',
+               'event_id')
+
+    def __init__(self, lon, lat, mag, time, depth, catalog_id=None,
+                 event_id=None):
+        self.lon = numpy.asarray(lon, dtype=numpy.float64)
+        self.lat = numpy.asarray(lat, dtype=numpy.float64)
+        self.mag = numpy.asarray(mag, dtype=numpy.float64)
+        self.time = numpy.asarray(time, dtype=numpy.int64)
+        self.depth = numpy.asarray(depth, dtype=numpy.float64)
+        if catalog_id is None:
+            catalog_id = numpy.full(self.time.size, -1)
+        if event_id is None:
+            event_id = numpy.arange(self.time.size)
+        self.catalog_id = numpy.asarray(catalog_id, dtype=numpy.int64)
+        self.event_id = numpy.asarray(event_id, dtype=numpy.int64)
+
+    @classmethod
+    def from_list(cls, events):
+        """
+        Creates a catalog from a list of CSEP formatted events in
+            lon, lat, mag, datetime, depth, catalog_id, event_id
+        (see libs.load_cat)
+        """
+        if len(events) == 0:
+            return cls.empty()
+        lon, lat, mag, time, depth, cat_id, event_id = zip(*events)
+        return cls(lon, lat, mag, datetime_to_epoch(time), depth, cat_id,
+                   event_id)
+
+    @classmethod
+    def empty(cls):
+        return cls(*[[] for _ in cls.columns])
+
+    @classmethod
+    def concatenate(cls, catalogs):
+        """
+        Joins a sequence of catalogs into a single one
+        """
+        catalogs = list(catalogs)
+        if not catalogs:
+            return cls.empty()
+        return cls(*[numpy.concatenate([getattr(i, col) for i in catalogs])
+                     for col in cls.columns])
+
+    def to_list(self):
+        """
+        Returns the catalog as a list of CSEP formatted events in
+            lon, lat, mag, datetime, depth, catalog_id, event_id
+        """
+        return list(map(list, zip(self.lon.tolist(),
+                                  self.lat.tolist(),
+                                  self.mag.tolist(),
+                                  epoch_to_datetime(self.time),
+                                  self.depth.tolist(),
+                                  self.catalog_id.tolist(),
+                                  self.event_id.tolist())))
+
+    @property
+    def datetimes(self):
+        """ Event times as numpy datetime64[us] """
+        return self.time.astype('datetime64[us]')
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, col).nbytes for col in self.columns)
+
+    def is_sorted(self):
+        return bool(numpy.all(self.time[1:] >= self.time[:-1]))
+
+    def sort(self):
+        """
+        Returns the catalog sorted by time. The sort is stable, so events with
+        equal times keep their original order. If already sorted, returns the
+        catalog itself.
+        """
+        if self.is_sorted():
+            return self
+        return self[numpy.argsort(self.time, kind='stable')]
+
+    def __len__(self):
+        return self.time.size
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, numpy.integer)):
+            # A single event is returned in the legacy list format
+            return self[item:item + 1 or None].to_list()[0]
+        return Catalog(*[getattr(self, col)[item] for col in self.columns])
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __repr__(self):
+        return f'Catalog(n_events={len(self)})'
+
+
+class CatalogIndex:
+    """
+    Time-sorted index of a catalog, to query the events within time windows
+    and above magnitude thresholds by binary search.
+
+    For every queried magnitude threshold, the index keeps (and memoizes) the
+    time-sorted sub-catalog of the events above it, whose sorted times act as
+    prefix counts: the number of events before a time t is the insertion
+    position of t. Hence, window queries return slice views of the arrays and
+    cost O(log N), instead of scanning the whole catalog.
+
+    The index also keeps the position of each event in the original catalog
+    (see positions), so the events of a query can be put back in their
+    original order, e.g. by the legacy engine of main.make_forecast.
+
+    Args:
+        catalog (Catalog, list): A Catalog or a CSEP formatted events list
+    """
+
+    def __init__(self, catalog):
+        if not isinstance(catalog, Catalog):
+            catalog = Catalog.from_list(catalog)
+        order = _sort_order(catalog)
+        self.catalog = catalog if order is None else catalog[order]
+        self._subsets = {None: self.catalog}
+        self._buffers = {}
+        self._window_counts = {}
+        # Positions in the original catalog, by chunks of extended events
+        self._position_chunks = [numpy.arange(len(catalog)) if order is None
+                                 else order]
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def subset(self, mag_min=None):
+        """
+        Returns the time-sorted catalog of events with magnitude >= mag_min
+        """
+        if mag_min is not None:
+            mag_min = float(mag_min)
+        if mag_min not in self._subsets:
+            self._subsets[mag_min] = self.catalog[self.catalog.mag >= mag_min]
+        return self._subsets[mag_min]
+
+    def positions(self, mag_min=None):
+        """
+        Returns the positions in the original catalog of the events of
+        subset(mag_min). Events added by extend follow those of the original
+        catalog, in the order they were added.
+        """
+        if len(self._position_chunks) > 1:
+            self._position_chunks = [numpy.concatenate(
+                self._position_chunks)]
+        if mag_min is not None:
+            mag_min = float(mag_min)
+        if mag_min not in self._positions:
+            positions = self._position_chunks[0]
+            if mag_min is not None:
+                positions = positions[self.catalog.mag >= mag_min]
+            self._positions[mag_min] = positions
+        return self._positions[mag_min]
+
+    def count_before(self, t, mag_min=None):
+        """
+        Number of events with time < t and magnitude >= mag_min
+        """
+        return int(numpy.searchsorted(self.subset(mag_min).time,
+                                      _as_epoch(t), side='left'))
+
+    def count_between(self, t1, t2, mag_min=None):
+        """
+        Number of events with t1 <= time < t2 and magnitude >= mag_min
+        """
+        return max(self.count_before(t2, mag_min) -
+                   self.count_before(t1, mag_min), 0)
+
+    def window_counts(self, t, length, mag_min=None):
+        """
+        Returns the number of events with magnitude >= mag_min in consecutive
+        time windows of a given length, from the date of the first event to
+        the date of the last event before t. That is, the same as
+            numpy.histogram(times, numpy.arange(first_time.date(),
+                                                last_time.date(), length))
+
+        The whole catalog is binned only once per (mag_min, length) and
+        memoized, so advancing t only slices the memoized counts.
+
+        Args:
+            t (datetime, int): Time (or epoch microseconds) of the query
+            length (timedelta, int): Window length (or its microseconds)
+            mag_min (float): Magnitude threshold
+        """
+        if isinstance(length, timedelta):
+            length = length // datetime.resolution
+        times = self.subset(mag_min).time
+        n_events = self.count_before(t, mag_min)
+        start = times[0] - times[0] % DAY_US
+        stop = times[n_events - 1] - times[n_events - 1] % DAY_US
+        n_edges = int(-(-(stop - start) // length))
+        if n_edges < 2:
+            edges = start + numpy.arange(n_edges) * length
+            return numpy.histogram(times[:n_events], edges)[0]
+
+        key = (mag_min if mag_min is None else float(mag_min), length)
+        if key not in self._window_counts:
+            self._window_counts[key] = numpy.bincount((times - start) //
+                                                      length)
+        counts = self._window_counts[key][:n_edges - 1].copy()
+
+        # The last window also includes the events at its right edge
+        last_edge = start + (n_edges - 1) * length
+        counts[-1] += (numpy.searchsorted(times, last_edge, side='right') -
+                       numpy.searchsorted(times, last_edge, side='left'))
+        return counts
+
+    def copy(self):
+        """
+        Returns a shallow copy of the index, sharing its arrays and memoized
+        subsets. Extending the copy leaves this index as it is, so it can be
+        read by other threads meanwhile (see store.CatalogStore.refresh).
+        """
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.catalog = self.catalog
+        index._subsets = dict(self._subsets)
+        index._buffers = dict(self._buffers)
+        index._window_counts = dict(self._window_counts)
+        index._position_chunks = list(self._position_chunks)
+        index._positions = dict(self._positions)
+        return index
+
+    def extend(self, catalog):
+        """
+        Adds events to the index in place, e.g. the new events of a growing
+        catalog (see store.CatalogStore). The index must not be read
+        concurrently, so an index shared between threads should be copied
+        and extended, and the copy swapped in (see copy). New events are
+        written past the end of the views of the original index, which are
+        left unchanged.
+
+        Events not earlier than the indexed ones are appended to the arrays of
+        the index, its memoized subsets and window counts. The arrays grow
+        geometrically, so the amortized cost is proportional to the number of
+        new events, rather than to the size of the catalog. Earlier events
+        are merged by rebuilding the index.
+
+        Args:
+            catalog (Catalog, list): A Catalog or a CSEP formatted events list
+        """
+        if not isinstance(catalog, Catalog):
+            catalog = Catalog.from_list(catalog)
+        if len(catalog) == 0:
+            return
+        n_old = len(self.catalog)
+        order = _sort_order(catalog)
+        if order is None:
+            order = numpy.arange(len(catalog))
+        else:
+            catalog = catalog[order]
+        if n_old and catalog.time[0] < self.catalog.time[-1]:
+            positions = numpy.concatenate([self.positions(), n_old + order])
+            self.__init__(Catalog.concatenate([self.catalog, catalog]))
+            self._position_chunks = [positions[self._position_chunks[0]]]
+            return
+
+        self._position_chunks.append(n_old + order)
+        self._positions = {}
+
+        new = {}
+        for mag_min in self._subsets:
+            events = catalog if mag_min is None else \
+                catalog[catalog.mag >= mag_min]
+            new[mag_min] = events
+            self._append(mag_min, events)
+        self.catalog = self._subsets[None]
+
+        for (mag_min, length), counts in list(self._window_counts.items()):
+            times = self._subsets[mag_min].time
+            n_old = len(times) - len(new[mag_min])
+            if n_old == 0:
+                del self._window_counts[mag_min, length]
+                continue
+            start = times[0] - times[0] % DAY_US
+            bins = (new[mag_min].time - start) // length
+            new_counts = numpy.bincount(bins, minlength=counts.size)
+            new_counts[:counts.size] += counts
+            self._window_counts[mag_min, length] = new_counts
+
+    def _append(self, mag_min, events):
+        """
+        Appends events to a memoized subset, within its growable buffer
+        """
+        subset = self._subsets[mag_min]
+        n_events = len(subset) + len(events)
+        buffer = self._buffers.get(mag_min)
+        if buffer is None or len(buffer) < n_events:
+            size = max(2 * n_events, 1024)
+            buffer = Catalog(*[
+                numpy.empty(size, dtype=getattr(subset, col).dtype)
+                for col in Catalog.columns])
+            for col in Catalog.columns:
+                getattr(buffer, col)[:len(subset)] = getattr(subset, col)
+            self._buffers[mag_min] = buffer
+        for col in Catalog.columns:
+            getattr(buffer, col)[len(subset):n_events] = getattr(events, col)
+        self._subsets[mag_min] = buffer[:n_events]
+
+    def events_before(self, t, mag_min=None):
+        """
+        Returns a view of the events with time < t and magnitude >= mag_min
+        """
+        return self.subset(mag_min)[:self.count_before(t, mag_min)]
+
+    def events_between(self, t1, t2, mag_min=None):
+        """
+        Returns a view of the events with t1 <= time < t2 and
+        magnitude >= mag_min
+        """
+        start = self.count_before(t1, mag_min)
+        end = max(self.count_before(t2, mag_min), start)
+        return self.subset(mag_min)[start:end]
+
+    def positions_before(self, t, mag_min=None):
+        """
+        Returns the positions in the original catalog of the events of
+        events_before(t, mag_min)
+        """
+        return self.positions(mag_min)[:self.count_before(t, mag_min)]
+
+    def positions_between(self, t1, t2, mag_min=None):
+        """
+        Returns the positions in the original catalog of the events of
+        events_between(t1, t2, mag_min)
+        """
+        start = self.count_before(t1, mag_min)
+        end = max(self.count_before(t2, mag_min), start)
+        return self.positions(mag_min)[start:end]
+
+
+def _sort_order(catalog):
+    """
+    Returns the stable time-sorting order of a catalog, or None if it is
+    already sorted
+    """
+    if catalog.is_sorted():
+        return None
+    return numpy.argsort(catalog.time, kind='stable')
+
+
+def _as_epoch(t):
+    if isinstance(t, datetime):
+        return datetime_to_epoch(t)
+    return t
@@ -0,0 +1,148 @@
+"""
+Evaluation of forecasts against an observed catalog, over many time windows
+(e.g. a daily hindcast): the observed number of events of each window, the
+number of events of each synthetic catalog, their mean and quantiles, and
+the quantile scores of the number test (N-test) of CSEP.
+
+The observed counts of all the windows are found by binary search on the
+time-sorted catalog (see catalog.CatalogIndex), and the counts of the
+synthetic catalogs of a window by a single bincount of their catalog ids.
+"""
+import os
+
+import numpy
+
+from pymock import libs
+from pymock.catalog import Catalog, CatalogIndex, datetime_to_epoch
+
+
+def observed_counts(catalog, windows, mag_min=None):
+    """
+    Returns the number of observed events within each time window
+
+    Args:
+        catalog (list, Catalog, CatalogIndex): The observed catalog
+        windows (list): A sequence of (start_date, end_date) windows (see
+            libs.forecast_windows)
+        mag_min (float): (Optional) Counts only events with magnitude >=
+            mag_min
+
+    Returns:
+        An integer array of shape (n_windows,)
+    """
+    if not isinstance(catalog, CatalogIndex):
+        catalog = CatalogIndex(catalog)
+    times = catalog.subset(mag_min).time
+    if not len(windows):
+        return numpy.zeros(0, dtype=numpy.int64)
+    start, end = datetime_to_epoch(list(windows)).T
+    return numpy.maximum(numpy.searchsorted(times, end, side='left') -
+                         numpy.searchsorted(times, start, side='left'), 0)
+
+
+def forecast_counts(forecast, n_sims, mag_min=None):
+    """
+    Returns the number of events of each synthetic catalog of a forecast
+
+    Args:
+        forecast (str, list, Catalog): The forecast, or the path of its file
+            (see libs.load_forecast)
+        n_sims (int): Number of synthetic catalogs of the forecast, counting
+            those without events
+        mag_min (float): (Optional) Counts only events with magnitude >=
+            mag_min
+
+    Returns:
+        An integer array of shape (n_sims,)
+    """
+    if isinstance(forecast, (str, os.PathLike)):
+        forecast = libs.load_forecast(forecast)
+    elif not isinstance(forecast, Catalog):
+        forecast = Catalog.from_list(forecast)
+    catalog_id = forecast.catalog_id
+    if mag_min is not None:
+        catalog_id = catalog_id[forecast.mag >= mag_min]
+    return numpy.bincount(catalog_id, minlength=n_sims)[:n_sims]
+
+
+def window_counts(forecasts, n_sims, mag_min=None):
+    """
+    Returns the number of events of each synthetic catalog of the forecasts
+    of several windows (see forecast_counts).
+
+    Args:
+        forecasts (list, array): The forecast of each window (or the paths of
+            their files). An array of counts of shape (n_windows, n_sims),
+            e.g. from main.make_window_rates, is returned as it is.
+        n_sims (int): Number of synthetic catalogs per window
+        mag_min (float): (Optional) Counts only events with magnitude >=
+            mag_min
+
+    Returns:
+        An integer array of shape (n_windows, n_sims)
+    """
+    if isinstance(forecasts, numpy.ndarray):
+        return forecasts
+    counts = numpy.zeros((len(forecasts), n_sims), dtype=numpy.int64)
+    for i, forecast in enumerate(forecasts):
+        counts[i] = forecast_counts(forecast, n_sims, mag_min)
+    return counts
+
+
+def number_test(counts, observed):
+    """
+    Quantile scores of the number test (N-test) of each window, from the
+    empirical distribution of the synthetic catalog counts: delta_1 is the
+    probability of observing at least the observed number of events, and
+    delta_2 of observing at most that number. A low delta_1 (delta_2) means
+    the forecast underestimates (overestimates) the number of events.
+
+    Args:
+        counts (array): Counts of the synthetic catalogs, of shape
+            (n_windows, n_sims)
+        observed (array): Observed counts, of shape (n_windows,)
+
+    Returns:
+        The delta_1 and delta_2 arrays, of shape (n_windows,)
+    """
+    counts = numpy.asarray(counts)
+    observed = numpy.asarray(observed)[:, None]
+    delta_1 = numpy.mean(counts >= observed, axis=1)
+    delta_2 = numpy.mean(counts <= observed, axis=1)
+    return delta_1, delta_2
+
+
+def evaluate(forecasts, catalog, windows, n_sims, mag_min=None,
+             quantiles=(0.025, 0.5, 0.975)):
+    """
+    Evaluates the forecasts of several windows against an observed catalog
+
+    Args:
+        forecasts (list, array): The forecast of each window, the paths of
+            their files, or their counts (see window_counts)
+        catalog (list, Catalog, CatalogIndex): The observed catalog
+        windows (list): The (start_date, end_date) window of each forecast
+        n_sims (int): Number of synthetic catalogs per window
+        mag_min (float): (Optional) Evaluates only events with magnitude >=
+            mag_min
+        quantiles (tuple): Quantiles of the synthetic catalog counts
+
+    Returns:
+        A dictionary of arrays over the windows, with the observed counts
+        ('observed'), the counts of the synthetic catalogs ('counts', of
+        shape (n_windows, n_sims)), their mean ('mean') and quantiles
+        ('quantiles', of shape (n_quantiles, n_windows)), and the N-test
+        scores ('delta_1', 'delta_2', see number_test)
+    """
+    if len(forecasts) != len(windows):
+        raise ValueError(f'{len(forecasts)} forecasts were given for '
+                         f'{len(windows)} windows')
+    counts = window_counts(forecasts, n_sims, mag_min)
+    observed = observed_counts(catalog, windows, mag_min)
+    delta_1, delta_2 = number_test(counts, observed)
+    return {'observed': observed,
+            'counts': counts,
+            'mean': counts.mean(axis=1),
+            'quantiles': numpy.quantile(counts, quantiles, axis=1),
+            'delta_1': delta_1,
+            'delta_2': delta_2}
@@ -1,35 +1,102 @@
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+import gzip
+import hashlib
+import io
+import json
 import os
+import queue
+import threading
+import warnings
 
+import numpy
 
-def syncat_path(start, end, folder, variant='long'):
+try:
+    import zstandard
+except ImportError:  # optional, for .zst forecasts
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:  # optional, for .lz4 forecasts
+    lz4 = None
+
+from pymock.catalog import Catalog
+
+# Binary layout of the events in the catalog cache files (see load_catalog)
+CATALOG_DTYPE = numpy.dtype([('lon', 'f8'), ('lat', 'f8'), ('mag', 'f8'),
+                             ('time', 'i8'), ('depth', 'f8'),
+                             ('catalog_id', 'i8'), ('event_id', 'i8')])
+CACHE_VERSION = 1
+# Block size to hash catalog files
+READ_BLOCK_SIZE = 2 ** 22
+
+# Forecast writer: number of events formatted at once, and file buffer size
+WRITE_BLOCK_SIZE = 2 ** 17
+WRITE_BUFFER_SIZE = 2 ** 22
+
+# Forecast file formats: CSEP csv, or numpy binary records of CATALOG_DTYPE
+FORECAST_FORMATS = ('csv', 'npy')
+# Length of the .npy header, reserved before the number of events is known
+NPY_HEADER_SIZE = 256
+# Compressions of the forecast files, given by an extra extension (e.g.
+# .csv.gz). zst and lz4 require the zstandard and lz4 packages.
+COMPRESSIONS = ('gz', 'zst', 'lz4')
+# Number of buffers (of WRITE_BUFFER_SIZE) queued for compression
+COMPRESS_QUEUE_SIZE = 4
+
+
+def syncat_path(start, end, folder, variant='long', fmt='csv'):
     """
     Returns the file path of a forecast based on its start and end dates.
+    The file extension is given by the forecast format (see
+    FORECAST_FORMATS), optionally followed by a compression (e.g. 'csv.gz',
+    see COMPRESSIONS).
     """
 
     if variant == 'short':
-        return os.path.join(folder, f'pymock_{start.date().isoformat()}.csv')
+        return os.path.join(folder,
+                            f'pymock_{start.date().isoformat()}.{fmt}')
 
     # Long version
-    filename = f"pymock_{start.date().isoformat()}_{end.date().isoformat()}.csv"
+    filename = f"pymock_{start.date().isoformat()}_" \
+               f"{end.date().isoformat()}.{fmt}"
     if os.name == 'nt':
         filename.replace(':', '.')  # on Windows, filenames cannot contain ':'
     return os.path.join(folder, filename)
 
 
+def forecast_windows(start, end, step=1):
+    """
+    Returns consecutive forecast windows between two dates
+
+    Args:
+        start (datetime): Start date of the first window
+        end (datetime): End date of the last window
+        step (int, float, timedelta): Window length (in days if a number)
+
+    Returns:
+        A list of (start_date, end_date) windows
+    """
+    if not isinstance(step, timedelta):
+        step = timedelta(days=step)
+    n_windows = int((end - start) / step)
+    return [(start + i * step, start + (i + 1) * step)
+            for i in range(n_windows)]
+
+
 def load_cat(path):
     """
     Loads a catalog forecast using the CSEP format
 
     Args:
-        path (str): Path to the catalog file
+        path (str): Path to the catalog file, which is decompressed if its
+            extension is a compression (see COMPRESSIONS)
 
     Returns:
         A list of CSEP formatted events in
             lon, lat, mag, time_str, depth, catalog_id, event_id
     """
     catalog = []
-    with open(path) as f_:
+    with _open_text(path) as f_:
         for line in f_.readlines()[1:]:
             line = line.split(',')
             event = [float(line[0]), float(line[1]), float(line[2]),
@@ -40,21 +107,618 @@ def load_cat(path):
     return catalog
 
 
-def write_forecast(start, end, forecast, folder=None):
+def load_catalog(path, cache=True, cache_dir=None, region=None):
+    """
+    Loads a catalog using the CSEP format into a columnar Catalog.
+
+    The file is parsed in bulk into typed arrays. If cache is True, the parsed
+    events are also stored in a binary sidecar file, which is keyed on the
+    size, modification time and hash of the source file. Later calls then
+    memory-map the sidecar file instead of parsing the catalog again. If rows
+    were appended to the catalog file since it was cached, only the new rows
+    are parsed and appended to the cache.
+
+    Compressed catalogs (see COMPRESSIONS) are decompressed while parsed, and
+    parsed again in full if modified.
+
+    Args:
+        path (str): Path to the catalog file
+        cache (bool): Read/write the binary cache of the catalog
+        cache_dir (str): (Optional) Folder of the cache files. Defaults to the
+            folder of the catalog file.
+        region (region.Region): (Optional) Keeps only the events inside the
+            region polygon
+
+    Returns:
+        A Catalog (see catalog.Catalog)
+    """
+    catalog = records_to_catalog(load_records(path, cache, cache_dir)[0])
+    if region is not None:
+        catalog = region.filter(catalog)
+    return catalog
+
+
+def read_new_events(path, size=0, sha1=None):
+    """
+    Parses the events appended to a catalog file after its first size bytes.
+
+    The first size bytes are only hashed and checked against sha1, so the
+    parsing cost is proportional to the new rows. A trailing incomplete row
+    (e.g. still being written) is left for the next read.
+
+    Args:
+        path (str): Path to the catalog file
+        size (int): Number of bytes of the file already read. If 0, the whole
+            file is parsed.
+        sha1 (str): sha1 hash of the first size bytes
+
+    Returns:
+        A tuple with the records of the new events (see CATALOG_DTYPE), and
+        the size and sha1 hash of the file contents read so far (dict).
+        Returns None if the first size bytes were modified, so the whole file
+        has to be read again.
+    """
+    if _compression(path) is not None:
+        return _read_compressed_events(path, size)
+
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as f_:
+        remaining = size
+        while remaining > 0:
+            block = f_.read(min(remaining, READ_BLOCK_SIZE))
+            if not block:
+                return None
+            hasher.update(block)
+            remaining -= len(block)
+            last = block[-1:]
+        if size and (hasher.hexdigest() != sha1 or last != b'\n'):
+            return None
+        tail = f_.read()
+
+    if size:
+        tail = tail[:tail.rfind(b'\n') + 1]
+    hasher.update(tail)
+    records = _parse_catalog(io.BytesIO(tail), skiprows=0 if size else 1)
+    return records, {'size': size + len(tail), 'sha1': hasher.hexdigest()}
+
+
+def _read_compressed_events(path, size=0):
+    """
+    Parses all the events of a compressed catalog file (see read_new_events).
+    Its new rows cannot be parsed on their own, so returns None if size is
+    given.
+    """
+    if size:
+        return None
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as f_:
+        for block in iter(lambda: f_.read(READ_BLOCK_SIZE), b''):
+            hasher.update(block)
+    with _open_compressed(path, 'rb') as f_:
+        records = _parse_catalog(f_)
+    return records, {'size': os.path.getsize(path),
+                     'sha1': hasher.hexdigest()}
+
+
+def load_records(path, cache=True, cache_dir=None):
+    """
+    Loads a catalog file as an array of records (see CATALOG_DTYPE), as
+    load_catalog does, along with the size and sha1 hash of the file contents
+    they were parsed from. These are the state to later parse only the rows
+    appended to the file (see read_new_events).
+
+    Args:
+        path (str): Path to the catalog file
+        cache (bool): Read/write the binary cache of the catalog
+        cache_dir (str): (Optional) Folder of the cache files
+
+    Returns:
+        A tuple with the records and the state (dict with size and sha1)
+    """
+    if cache:
+        cached = _read_catalog_cache(path, cache_dir)
+        if cached is not None:
+            records, meta = cached
+            return records, {'size': meta['size'], 'sha1': meta['sha1']}
+
+    records, state = read_new_events(path)
+    if cache:
+        _write_catalog_cache(path, records, state, cache_dir)
+    return records, state
+
+
+def _parse_catalog(source, skiprows=1):
+    """
+    Parses a CSEP formatted catalog (file path or binary file object) into an
+    array of CATALOG_DTYPE records
+    """
+    dtype = [(name, 'M8[us]') if name == 'time' else (name, fmt)
+             for name, (fmt, _) in CATALOG_DTYPE.fields.items()]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # empty catalogs
+        records = numpy.loadtxt(source, delimiter=',', skiprows=skiprows,
+                                dtype=dtype, ndmin=1)
+    return records.view(CATALOG_DTYPE)
+
+
+def records_to_catalog(records):
+    """
+    Returns a Catalog whose columns are the fields of an array of records
+    (see CATALOG_DTYPE)
+    """
+    return Catalog(*[records[col] for col in Catalog.columns])
+
+
+def _catalog_cache_paths(path, cache_dir=None):
+    """
+    Returns the paths of the binary cache and its metadata for a catalog file
+    """
+    folder = os.path.dirname(path) if cache_dir is None else cache_dir
+    basename = os.path.join(folder, os.path.basename(path))
+    return f'{basename}.pymock.bin', f'{basename}.pymock.json'
+
+
+def file_key(path):
+    """
+    Returns the size and modification time of a file, which identify its
+    version (e.g. to detect changes of a catalog file)
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_cache_meta(path, cache_dir=None):
+    meta_path = _catalog_cache_paths(path, cache_dir)[1]
+    try:
+        with open(meta_path) as f_:
+            meta = json.load(f_)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _read_catalog_cache(path, cache_dir=None):
+    """
+    Memory-maps the cached records of a catalog file, and returns them with
+    the cache metadata. If rows were appended to the catalog file, they are
+    parsed and appended to the cache first. Returns None if there is no
+    cache, or if it is outdated with respect to the catalog file.
+    """
+    meta = _read_cache_meta(path, cache_dir)
+    if meta is None:
+        return None
+
+    key = file_key(path)
+    if key != {'size': meta['size'], 'mtime_ns': meta['mtime_ns']}:
+        # File was touched or appended to (or modified, checked by its hash)
+        if key['size'] < meta['size']:
+            return None
+        new = read_new_events(path, meta['size'], meta['sha1'])
+        if new is None:
+            return None
+        meta = _append_catalog_cache(path, meta, *new, cache_dir)
+
+    if meta['n_events'] == 0:
+        return numpy.empty(0, dtype=CATALOG_DTYPE), meta
+    bin_path = _catalog_cache_paths(path, cache_dir)[0]
+    try:
+        return numpy.memmap(bin_path, dtype=CATALOG_DTYPE, mode='r',
+                            shape=(meta['n_events'],)), meta
+    except (OSError, ValueError):
+        return None
+
+
+def _write_catalog_cache(path, records, state, cache_dir=None):
+    """
+    Writes the records of a catalog file and the source file's key into the
+    cache files. Fails silently if the cache folder is not writable.
+    """
+    bin_path, meta_path = _catalog_cache_paths(path, cache_dir)
+    meta = {'version': CACHE_VERSION, **file_key(path), **state,
+            'n_events': len(records)}
+    try:
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{bin_path}.{os.getpid()}.tmp'
+        records.tofile(tmp_path)
+        os.replace(tmp_path, bin_path)
+        _write_json(meta_path, meta)
+    except OSError:
+        pass
+
+
+def append_catalog_cache(path, base_state, records, state, cache_dir=None):
+    """
+    Appends the records of the rows appended to a catalog file (see
+    read_new_events) to its binary cache, provided the cache holds exactly
+    the contents read before, given by base_state. Otherwise, the cache is
+    left as it is, to be rebuilt by its next load.
+
+    Args:
+        path (str): Path to the catalog file
+        base_state (dict): Size and sha1 hash of the contents read before
+        records (array): Records of the new rows
+        state (dict): Size and sha1 hash of the contents read so far
+        cache_dir (str): (Optional) Folder of the cache files
+    """
+    meta = _read_cache_meta(path, cache_dir)
+    if meta is not None and meta['size'] == base_state['size'] and \
+            meta['sha1'] == base_state['sha1']:
+        _append_catalog_cache(path, meta, records, state, cache_dir)
+
+
+def _append_catalog_cache(path, meta, records, state, cache_dir=None):
+    """
+    Appends the records of new events to the cache files of a catalog file,
+    whose metadata is meta. Returns the updated metadata. The records are
+    written before the metadata, so concurrent readers only map the events
+    already listed in it.
+    """
+    bin_path, meta_path = _catalog_cache_paths(path, cache_dir)
+    meta = {**meta, **file_key(path), **state,
+            'n_events': meta['n_events'] + len(records)}
+    try:
+        if len(records):
+            with open(bin_path, 'r+b') as f_:
+                f_.seek(CATALOG_DTYPE.itemsize * (meta['n_events'] -
+                                                  len(records)))
+                records.tofile(f_)
+        _write_json(meta_path, meta)
+    except OSError:
+        pass
+    return meta
+
+
+def _write_json(path, obj):
+    """
+    Writes a json file atomically, so concurrent readers never see it partial
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f_:
+        json.dump(obj, f_)
+    os.replace(tmp_path, path)
+
+
+def write_forecast(start, end, forecast, folder=None, fmt='csv',
+                   region=None, level=None):
     """
     Writes a catalog forecast using the CSEP format  in
         lon, lat, mag, time_str, depth, catalog_id, event_id
+
+    The forecast can be either a list of events, a columnar Catalog (see
+    catalog.Catalog) or an iterable of chunks of them (e.g. from
+    main.iter_forecast), which are written as they are consumed.
+
+    Args:
+        start (datetime): Start date of the forecast
+        end (datetime): End date of the forecast
+        forecast (list, Catalog, iterable): The forecast
+        folder (str): Output folder. Defaults to 'forecasts'
+        fmt (str): File format, either the CSEP 'csv' (default) or the
+            binary 'npy' (see save_forecast), optionally compressed (e.g.
+            'csv.gz', see COMPRESSIONS)
+        region (region.Region): (Optional) Writes only the events inside the
+            region polygon
+        level (int): (Optional) Compression level (see save_forecast)
     """
 
+    base, _, compression = fmt.partition('.')
+    if base not in FORECAST_FORMATS or \
+            (compression and compression not in COMPRESSIONS):
+        raise ValueError(f"Forecast format '{fmt}' not recognized. "
+                         f"Use one of {FORECAST_FORMATS}, optionally "
+                         f"followed by one of {COMPRESSIONS}")
     if folder is None:
         folder = 'forecasts'
     os.makedirs(folder, exist_ok=True)
-    with open(syncat_path(start, end, folder), 'w') as file_:
+    save_forecast(syncat_path(start, end, folder, fmt=fmt), forecast,
+                  region, level)
+
+
+def save_forecast(path, forecast, region=None, level=None):
+    """
+    Writes a forecast to a file, whose format is given by its extension:
+        .csv: CSEP formatted csv
+        .npy: numpy binary file of CATALOG_DTYPE records, which can be read
+              back with no parsing (see load_forecast)
+
+    Either can be compressed, with a further .gz, .zst or .lz4 extension
+    (e.g. .csv.gz). The compression runs in a background thread. For csv,
+    it overlaps with the formatting of the next events and, for a stream of
+    chunks (e.g. from main.iter_forecast), with their simulation. Binary
+    forecasts are written uncompressed to a temporary file first, which is
+    compressed once the stream ends (see _save_npy).
+
+    Args:
+        path (str): Path of the forecast file
+        forecast (list, Catalog, iterable): The forecast (see write_forecast)
+        region (region.Region): (Optional) Writes only the events inside the
+            region polygon
+        level (int): (Optional) Compression level, trading CPU time for file
+            size. Defaults to 6 for gz, and to the library default for zst
+            and lz4.
+    """
+    if isinstance(forecast, (list, tuple, Catalog)):
+        forecast = [forecast]
+    if region is not None:
+        forecast = (region.filter(chunk if isinstance(chunk, Catalog) else
+                                  Catalog.from_list(chunk))
+                    for chunk in forecast)
+
+    if _forecast_format(path) == 'npy':
+        _save_npy(path, forecast, level)
+        return
+
+    with _open_writer(path, level) as file_:
         file_.write('lon,lat,mag,time_string,depth,catalog_id,event_id\n')
-        for event in forecast:
-            line = f'{event[0]},{event[1]},{event[2]:.2f},' \
-                   f'{event[3].isoformat()},{event[4]},{event[5]},{event[6]}\n'
-            file_.write(line)
+        for chunk in forecast:
+            if isinstance(chunk, Catalog):
+                # Columnar catalogs are formatted in bulk, by blocks of events
+                for i in range(0, len(chunk), WRITE_BLOCK_SIZE):
+                    file_.write(format_csv(chunk[i:i + WRITE_BLOCK_SIZE]))
+                continue
+            for event in chunk:
+                line = f'{event[0]},{event[1]},{event[2]:.2f},' \
+                       f'{event[3].isoformat()},{event[4]},{event[5]},' \
+                       f'{event[6]}\n'
+                file_.write(line)
+
+
+def load_forecast(path, mmap=True):
+    """
+    Reads a forecast file into a Catalog, detecting its format and
+    compression from the file extension (see save_forecast). Binary
+    forecasts are memory-mapped, so their arrays are views of the file
+    (zero-copy), unless compressed.
+
+    Args:
+        path (str): Path of the forecast file
+        mmap (bool): Memory-map binary forecasts, instead of reading them
+            into memory.
+    """
+    if _forecast_format(path) == 'npy':
+        if _compression(path) is not None:
+            with _open_compressed(path, 'rb') as f_:
+                records = numpy.lib.format.read_array(f_)
+        else:
+            records = numpy.load(path, mmap_mode='r' if mmap else None)
+        return records_to_catalog(records.view(CATALOG_DTYPE))
+    return load_catalog(path, cache=False)
+
+
+def convert_forecast(src, dst):
+    """
+    Converts a forecast file between the csv and binary formats, and their
+    compressions, given by the extensions of the source and destination
+    paths.
+    """
+    catalog = load_forecast(src)
+    chunks = (catalog[i:i + WRITE_BLOCK_SIZE]
+              for i in range(0, len(catalog), WRITE_BLOCK_SIZE))
+    save_forecast(dst, chunks)
+
+
+def _forecast_format(path):
+    if _compression(path) is not None:
+        path = os.path.splitext(path)[0]
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    return fmt if fmt in FORECAST_FORMATS else 'csv'
+
+
+def _compression(path):
+    compression = os.path.splitext(path)[1].lstrip('.').lower()
+    return compression if compression in COMPRESSIONS else None
+
+
+def _open_compressed(path, mode, level=None):
+    """
+    Opens a compressed file in binary mode, with the compression given by its
+    extension (see COMPRESSIONS)
+    """
+    compression = _compression(path)
+    if compression == 'gz':
+        return gzip.open(path, mode, compresslevel=6 if level is None else
+                         level)
+    if compression == 'zst':
+        if zstandard is None:
+            raise ImportError("The 'zstandard' package is required for .zst "
+                              "files")
+        if 'w' in mode:
+            kwargs = {} if level is None else {'level': level}
+            return zstandard.open(path, mode,
+                                  cctx=zstandard.ZstdCompressor(**kwargs))
+        return zstandard.open(path, mode)
+    if compression == 'lz4':
+        if lz4 is None:
+            raise ImportError("The 'lz4' package is required for .lz4 files")
+        return lz4.frame.open(path, mode, compression_level=level or 0)
+    raise ValueError(f"Compression of '{path}' not recognized. "
+                     f"Use one of {COMPRESSIONS}")
+
+
+def _open_text(path):
+    """
+    Opens a (possibly compressed) text file for reading
+    """
+    if _compression(path) is None:
+        return open(path)
+    return io.TextIOWrapper(_open_compressed(path, 'rb'))
+
+
+def _open_writer(path, level=None):
+    """
+    Opens a text file to write a forecast, or a background writer if it is
+    compressed
+    """
+    if _compression(path) is None:
+        return open(path, 'w', buffering=WRITE_BUFFER_SIZE)
+    return _BackgroundWriter(_open_compressed(path, 'wb', level))
+
+
+class _BackgroundWriter:
+    """
+    Writes to a (compressed) binary file from a background thread. Written
+    data (str or bytes) is gathered into buffers of WRITE_BUFFER_SIZE, which
+    are queued for the thread, so the compression of a buffer overlaps with
+    the production of the next ones (zlib, zstd and lz4 release the GIL).
+    Errors of the thread are raised by the next write, or on close.
+    """
+
+    def __init__(self, file_):
+        self._file = file_
+        self._buffer = []
+        self._size = 0
+        self._error = None
+        self._queue = queue.Queue(COMPRESS_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is None:
+                try:
+                    self._file.write(data)
+                except Exception as error:
+                    self._error = error
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= WRITE_BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._queue.put(b''.join(self._buffer))
+            self._buffer, self._size = [], 0
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _catalog_to_records(catalog):
+    if not isinstance(catalog, Catalog):
+        catalog = Catalog.from_list(catalog)
+    records = numpy.empty(len(catalog), dtype=CATALOG_DTYPE)
+    for col in Catalog.columns:
+        records[col] = getattr(catalog, col)
+    return records
+
+
+def _npy_header(n_events):
+    """
+    Returns a .npy (version 1.0) header for n_events records, padded to
+    NPY_HEADER_SIZE bytes so it can be rewritten in place
+    """
+    header = repr({'descr': numpy.lib.format.dtype_to_descr(CATALOG_DTYPE),
+                   'fortran_order': False, 'shape': (n_events,)})
+    prefix = numpy.lib.format.magic(1, 0)
+    size = NPY_HEADER_SIZE - len(prefix) - 2
+    header = header.ljust(size - 1) + '\n'
+    return prefix + size.to_bytes(2, 'little') + header.encode('latin1')
+
+
+def _save_npy(path, chunks, level=None):
+    """
+    Writes chunks of a forecast as a .npy file of records, as they are
+    consumed. The header is written last, once the number of events is known.
+    Compressed files cannot be rewritten, so their chunks are streamed to a
+    temporary uncompressed file first, which is then compressed by blocks.
+    """
+    if _compression(path) is None:
+        _stream_npy(path, chunks)
+        return
+
+    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+    try:
+        _stream_npy(tmp_path, chunks)
+        with open(tmp_path, 'rb') as src, _open_writer(path, level) as dst:
+            for block in iter(lambda: src.read(WRITE_BUFFER_SIZE), b''):
+                dst.write(block)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _stream_npy(path, chunks):
+    n_events = 0
+    with open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as file_:
+        file_.write(_npy_header(0))
+        for chunk in chunks:
+            records = _catalog_to_records(chunk)
+            file_.write(records.tobytes())
+            n_events += len(records)
+        file_.seek(0)
+        file_.write(_npy_header(n_events))
+
+
+def format_csv(catalog):
+    """
+    Formats a Catalog into CSEP formatted csv lines (without header).
+
+    Each column is formatted at once: the numeric columns are formatted only
+    for their unique values (e.g., the locations sampled from the input
+    catalog, the binned magnitudes or the catalog ids), and the times are
+    converted to ISO strings by numpy. The output is identical to formatting
+    each event as
+        f'{lon},{lat},{mag:.2f},{time.isoformat()},{depth},{cat_id},{id}'
+    """
+    if len(catalog) == 0:
+        return ''
+    columns = [_format_unique(catalog.lon, str),
+               _format_unique(catalog.lat, str),
+               _format_unique(catalog.mag, '{:.2f}'.format),
+               _format_times(catalog.time),
+               _format_unique(catalog.depth, str),
+               _format_unique(catalog.catalog_id, str),
+               _format_unique(catalog.event_id, str)]
+    return '\n'.join(map(','.join, zip(*columns))) + '\n'
+
+
+def _format_unique(values, formatter):
+    """
+    Formats an array of 64-bit numbers, calling formatter once per unique
+    value. The values are compared by their bits, so e.g. 0.0 and -0.0 are
+    kept apart.
+    """
+    bits, inverse = numpy.unique(values.view(numpy.int64), return_inverse=True)
+    strings = [formatter(i) for i in bits.view(values.dtype).tolist()]
+    return numpy.array(strings, dtype=object)[inverse.ravel()].tolist()
+
+
+def _format_times(times):
+    """
+    Formats epoch microseconds as in datetime.isoformat(), i.e. omitting the
+    fraction of second when it is zero
+    """
+    times_ = times.astype('datetime64[us]')
+    strings = numpy.datetime_as_string(times_, unit='us').astype(object)
+    whole = times % 1000000 == 0
+    if whole.any():
+        strings[whole] = numpy.datetime_as_string(times_[whole], unit='s')
+    return strings.tolist()
 
 
 def read_args(path):
@@ -63,18 +727,7 @@ def read_args(path):
     {argument} = {argument_value}
     """
 
-    map_dict = {  # lists all supported params and their string -> type mapping
-        "start_date": datetime.fromisoformat,
-        "end_date": datetime.fromisoformat,
-        "catalog": lambda x: os.path.join(os.path.dirname(path), x),
-        "mag_min": float,
-        "n_sims": int,
-        "seed": int,
-        "distribution": str,
-        "lookback_days": int,
-        "mag_compl": float,
-        "apply_mc_to_lambda": bool
-    }
+    map_dict = _args_types(os.path.dirname(path))
 
     params = {}
 
@@ -89,3 +742,67 @@ def read_args(path):
             params[k] = map_dict.get(k, str)(v)
 
     return params
+
+
+def parse_args(params, folder=''):
+    """
+    Converts the values of an arguments dictionary (e.g. decoded from json)
+    to the types of read_args. String values are parsed, whereas values that
+    are already typed are kept. Unknown arguments are left as they are.
+
+    Args:
+        params (dict): Arguments and their values
+        folder (str): Folder which a relative catalog path refers to
+    """
+    map_dict = _args_types(folder)
+    parsed = {}
+    for k, v in params.items():
+        if k in map_dict and (isinstance(v, str) or
+                              map_dict[k] in (int, float, _parse_bool)):
+            v = map_dict[k](v)
+        parsed[k] = v
+    return parsed
+
+
+def _args_types(folder):
+    """
+    Lists all supported params and their string -> type mapping
+    """
+    return {
+        "start_date": datetime.fromisoformat,
+        "end_date": datetime.fromisoformat,
+        "catalog": lambda x: os.path.join(folder, x),
+        "mag_min": float,
+        "n_sims": int,
+        "seed": int,
+        "distribution": str,
+        "lookback_days": int,
+        "mag_compl": float,
+        "apply_mc_to_lambda": bool,
+        "chunk_size": int,
+        "output_format": str,
+        "compression_level": int,
+        "region": lambda x: os.path.join(folder, x),
+        "region_dh": float,
+        "region_filter": _parse_bool,
+        "region_sparse": _parse_bool,
+        "b_value": float,
+        "mag_max": float,
+        "mag_bin_width": float,
+        "continuous_mags": _parse_bool,
+        "result_cache": lambda x: os.path.join(folder, x),
+        "result_cache_size": float
+    }
+
+
+def _parse_bool(value):
+    """
+    Parses a boolean, e.g. 'False' (note bool('False') is True)
+    """
+    if isinstance(value, str):
+        if value.strip().lower() in ('true', '1', 'yes'):
+            return True
+        if value.strip().lower() in ('false', '0', 'no', ''):
+            return False
+        raise ValueError(f"Boolean value '{value}' not recognized.")
+    return bool(value)
@@ -0,0 +1,84 @@
+import functools
+
+import numpy
+
+
+class GRSampler:
+    """
+    Sampler of Gutenberg-Richter (GR) magnitudes between mag_min and mag_max,
+    with a given b-value.
+
+    The binned distribution is tabulated once, as the magnitude bins (edges
+    every bin_width from mag_min), the probability of each bin and its
+    cumulative distribution. Magnitudes are then drawn in batches of any size
+    by inverting the cumulative distribution (see sample). Use gr_sampler to
+    share the samplers of equal parameters.
+
+    mag_max is the upper edge of the last bin, i.e. binned magnitudes are the
+    lower edges from mag_min to mag_max - bin_width, and continuous
+    magnitudes are drawn below mag_max. The number of bins is rounded to the
+    nearest integer, so mag_max - mag_min should be a multiple of bin_width.
+    The default table (b=1, mag_max=8, bin_width=0.1) is built as in previous
+    pymock versions, numpy.arange(mag_min, 8.1, 0.1), so seeded forecasts
+    are reproduced bit by bit.
+
+    Args:
+        mag_min (float): Minimum magnitude
+        b (float): GR b-value
+        mag_max (float): Upper edge of the magnitude bins
+        bin_width (float): Width of the magnitude bins
+        continuous (bool): Draws unbinned magnitudes from the truncated GR
+            (exponential) distribution, instead of the lower edges of the
+            bins
+    """
+
+    def __init__(self, mag_min, b=1.0, mag_max=8.0, bin_width=0.1,
+                 continuous=False):
+        self.mag_min = mag_min
+        self.b = b
+        self.mag_max = mag_max
+        self.bin_width = bin_width
+        self.continuous = continuous
+
+        if (b, mag_max, bin_width) == (1.0, 8.0, 0.1):
+            self.bins = numpy.arange(mag_min, 8.1, 0.1)  # legacy table
+        else:
+            n_bins = int(round((mag_max - mag_min) / bin_width))
+            self.bins = mag_min + bin_width * numpy.arange(n_bins + 1)
+        self.prob = 10 ** (-b * self.bins[:-1]) - 10 ** (-b * self.bins[1:])
+        self.prob /= numpy.sum(self.prob)
+        self.cdf = numpy.cumsum(self.prob)
+        self.cdf /= self.cdf[-1]
+        for array in (self.bins, self.prob, self.cdf):
+            array.flags.writeable = False
+
+    def sample(self, rng, size=None):
+        """
+        Draws magnitudes by inverse transform sampling of uniform numbers
+
+        Args:
+            rng (numpy.random.Generator, numpy.random.RandomState): Source of
+                random numbers
+            size (int): Number of magnitudes. If None, draws a single one.
+        """
+        u = rng.random(size)
+        if self.continuous:
+            # Inverse of the GR cdf truncated at the bins' upper edge
+            tail = 1 - 10 ** (-self.b * (self.bins[-1] - self.mag_min))
+            return self.mag_min - numpy.log10(1 - u * tail) / self.b
+        idx = numpy.searchsorted(self.cdf, u, side='right')
+        return self.bins[:-1][numpy.minimum(idx, self.cdf.size - 1)]
+
+    def __repr__(self):
+        return (f'GRSampler(mag_min={self.mag_min}, b={self.b}, '
+                f'mag_max={self.mag_max}, bin_width={self.bin_width}, '
+                f'continuous={self.continuous})')
+
+
+@functools.lru_cache(maxsize=None)
+def gr_sampler(mag_min, b=1.0, mag_max=8.0, bin_width=0.1, continuous=False):
+    """
+    Returns the GRSampler of a set of parameters, cached so it is built only
+    once and shared by all the forecast windows
+    """
+    return GRSampler(mag_min, b, mag_max, bin_width, continuous)
@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 from datetime import datetime, timedelta
@@ -7,6 +8,12 @@ import numpy
 import pymock
 
 from pymock import libs
+from pymock.catalog import Catalog, CatalogIndex, datetime_to_epoch
+from pymock.magnitudes import gr_sampler
+from pymock.profiling import Profiler
+from pymock.region import (Region, grid_counts, grid_path,
+                           write_gridded_rates)
+from pymock.results import ResultCache
 
 
 def default_args_path():
@@ -17,7 +24,8 @@ def default_forecast_folder():
     return Path(pymock.__file__).parent.parent / 'forecasts'
 
 
-def main(arg_path=None, folder=None, verbose=False):
+def main(arg_path=None, folder=None, verbose=False, profile=False,
+         hooks=()):
     """
     Main pymock's function
     Contains the main steps of creating a forecast for a given time window.
@@ -25,13 +33,27 @@ def main(arg_path=None, folder=None, verbose=False):
     1. Parse an argument file
     2. Reads the input catalog
     3. Creates the forecast as synthetic catalogs
-    4. Writes the synthetic catalogs
+    4. Writes the synthetic catalogs, and their gridded rates over the
+       testing region, if any (steps 3 and 4, see forecast_window)
+
+    Each step is instrumented as a stage (see profiling.Profiler), whose
+    record has its wall time and, as relevant, the number of events, the
+    model rates and the bytes written.
 
     params:
         arg_path (str): Path to the input arguments file.
         folder (str): (Optional) Path to save output. Defaults to 'forecasts'
         verbose (bool): print log
+        profile (bool): Also measures the peak memory of each stage, prints
+            the stages and writes their records to a json file next to the
+            forecast (<forecast file name>_profile.json)
+        hooks (list): Callables that receive the record of each stage as
+            soon as it ends
+
+    Returns:
+        The records of the stages
     """
+    profiler = Profiler(hooks, memory=profile)
 
     if arg_path is None:
         arg_path = default_args_path()
@@ -42,36 +64,537 @@ def main(arg_path=None, folder=None, verbose=False):
     os.makedirs(folder, exist_ok=True)
 
     # 1. Gets input data and arguments.
-    args = libs.read_args(arg_path)  # A dictionary containing parameters
+    with profiler.stage('read_args'):
+        args = libs.read_args(arg_path)  # A dictionary containing parameters
 
     cat_path = args.get('catalog')
+
+    # 2. Reads input catalog (memory-mapped from its binary cache, if any),
+    # optionally restricted to the testing region
+    with profiler.stage('load_catalog') as record:
+        region = None
+        if args.get('region'):
+            region = Region.from_file(args['region'],
+                                      args.get('region_dh', 0.1))
+        region_filter = region if args.get('region_filter') else None
+        catalog = libs.load_catalog(path=cat_path, region=region_filter)
+        record['n_events'] = len(catalog)
+
+    # 3-4. Run model and write forecasts
+    output = forecast_window(catalog, args, folder, region, verbose=verbose,
+                             profiler=profiler)
+
+    if profile:
+        print(profiler.summary())
+        profiler.dump(os.path.splitext(output['path'])[0] +
+                      '_profile.json')
+    return profiler.records
+
+
+def forecast_window(input_catalog, args, folder, region=None, verbose=False,
+                    profiler=None):
+    """
+    Creates the forecast of the window of an arguments dictionary, and writes
+    it (steps 3 and 4 of main), from an input catalog already loaded (e.g. by
+    a server, see server.ForecastServer):
+
+    3. Creates the forecast as synthetic catalogs, streamed in chunks if
+       chunk_size is given, or taken from the result cache if result_cache
+       is given
+    4. Writes the synthetic catalogs, and their gridded rates over the
+       testing region, if any
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            make_forecast), already restricted to the region if
+            region_filter is given
+        args (dict): Contains the arguments and its values
+        folder (str): Output folder
+        region (region.Region): (Optional) The testing region of the args,
+            if already built. Otherwise, it is read from the args' region
+            file, if any.
+        verbose (bool): print log
+        profiler (profiling.Profiler): (Optional) Records the 'forecast' and
+            'write' stages (see main)
+
+    Returns:
+        A dictionary with the path of the forecast file ('path') and its
+        number of events ('n_events')
+    """
+    if profiler is None:
+        profiler = Profiler()
+    if region is None and args.get('region'):
+        region = Region.from_file(args['region'], args.get('region_dh', 0.1))
     n_sims = args.get('n_sims', 1000)  # Gets from args or default to 1000
     seed = args.get('seed', None)  # Gets from args or default to seed
 
-    # 2. Reads input catalog
-    catalog = libs.load_cat(path=cat_path)
-
-    # 3. Run model
-    forecast = make_forecast(catalog,
-                             args,
-                             n_sims=n_sims,
-                             seed=seed,
-                             verbose=verbose)
+    # 3. Run model (streamed in chunks of synthetic catalogs, if requested,
+    # which are then simulated as they are written)
+    if args.get('chunk_size'):
+        with profiler.stage('model'):
+            forecast = iter_forecast(input_catalog,
+                                     args,
+                                     n_sims=n_sims,
+                                     seed=seed,
+                                     chunk_size=args['chunk_size'],
+                                     profiler=profiler)
+        forecast = profiler.iterate('forecast', forecast)
+    else:
+        with profiler.stage('forecast', n_sims=n_sims):
+            forecast = make_forecast(input_catalog,
+                                     args,
+                                     n_sims=n_sims,
+                                     seed=seed,
+                                     verbose=verbose,
+                                     as_catalog=True,
+                                     profiler=profiler,
+                                     cache=_result_cache(args))
 
     # 4. Write forecasts
-    libs.write_forecast(args['start_date'], args['end_date'], forecast, folder)
+    with profiler.stage('write') as record:
+        record['bytes'] = write_window(forecast, args, folder, region, n_sims)
+
+    forecast_record = [i for i in profiler.records
+                       if i['stage'] == 'forecast'][-1]
+    path = libs.syncat_path(args['start_date'], args['end_date'], folder,
+                            fmt=args.get('output_format', 'csv'))
+    return {'path': path, 'n_events': forecast_record['n_events']}
+
+
+def write_window(forecast, args, folder, region=None, n_sims=None):
+    """
+    Writes the forecast of the window of an arguments dictionary (step 4 of
+    main): the synthetic catalogs, in the args' output_format, and their
+    gridded rates over the testing region, if any, counted in the same pass
+    (see region.write_gridded_rates).
+
+    Args:
+        forecast (Catalog, iterable): The forecast, or an iterable of its
+            chunks (e.g. from iter_forecast)
+        args (dict): Contains the arguments and its values
+        folder (str): Output folder
+        region (region.Region): (Optional) The testing region. Only the
+            synthetic events inside it are written if region_filter is given.
+        n_sims (int): Number of synthetic catalogs of the forecast, to
+            normalize the gridded rates. Defaults to the args' n_sims.
+
+    Returns:
+        The number of bytes written
+    """
+    if n_sims is None:
+        n_sims = args.get('n_sims', 1000)
+    start, end = args['start_date'], args['end_date']
+    fmt = args.get('output_format', 'csv')
+    if region is not None:
+        mag_bins = _mag_sampler(args).bins
+        counts = numpy.zeros((len(region), mag_bins.size - 1), dtype=int)
+        chunks = [forecast] if isinstance(forecast, Catalog) else forecast
+        forecast = _count_chunks(chunks, region, mag_bins, counts)
+
+    libs.write_forecast(start, end, forecast, folder, fmt=fmt,
+                        region=region if args.get('region_filter') else None,
+                        level=args.get('compression_level'))
+    n_bytes = os.path.getsize(libs.syncat_path(start, end, folder, fmt=fmt))
+    if region is not None:
+        path = grid_path(start, end, folder)
+        write_gridded_rates(path, region, counts / n_sims, mag_bins,
+                            sparse=args.get('region_sparse', False))
+        n_bytes += os.path.getsize(path)
+    return n_bytes
+
+
+def _count_chunks(chunks, region, mag_bins, counts):
+    """
+    Passes through forecast chunks, adding their events to the gridded
+    counts
+    """
+    for chunk in chunks:
+        counts += grid_counts(chunk, region, mag_bins)
+        yield chunk
+
+
+def main_windows(arg_path=None, folder=None, start=None, end=None, step=1,
+                 seed=None, workers=1):
+    """
+    Creates the forecasts of consecutive time windows in a single run, e.g.
+    a season of daily forecasts, from an arguments file. The arguments file
+    is read and the input catalog is loaded and indexed only once for all
+    the windows, which are then forecast over a pool of processes (see
+    parallel.run_forecasts).
+
+    Each window gets its own random stream, derived from the root seed and
+    the window dates (see parallel.window_seed), so a window's forecast does
+    not depend on the other windows of the run, nor on the number of
+    workers. The forecasts are written as libs.syncat_path files in folder,
+    along with their gridded rates if the args give a region, as by main
+    (see write_window).
+
+    params:
+        arg_path (str): Path to the input arguments file.
+        folder (str): (Optional) Path to save output. Defaults to 'forecasts'
+        start (datetime): Start date of the first window. Defaults to the
+            args' start_date
+        end (datetime): End date of the last window. Defaults to the args'
+            end_date
+        step (int, float, timedelta): Window length (in days if a number)
+        seed (int): Root seed. Defaults to the args' seed
+        workers (int): Number of processes. Defaults to 1, i.e. all the
+            windows run in the current process
+
+    Returns:
+        The list of the written forecast files
+    """
+    from pymock import parallel  # parallel imports this module
+
+    if arg_path is None:
+        arg_path = default_args_path()
+    if folder is None:
+        folder = default_forecast_folder()
+    os.makedirs(folder, exist_ok=True)
 
+    args = libs.read_args(arg_path)
+    region = None
+    if args.get('region'):
+        region = Region.from_file(args['region'], args.get('region_dh', 0.1))
+    region_filter = region if args.get('region_filter') else None
+    catalog = libs.load_catalog(path=args.get('catalog'),
+                                region=region_filter)
 
-def make_forecast(input_catalog, args, n_sims=1000, seed=None, verbose=True):
+    windows = libs.forecast_windows(start or args['start_date'],
+                                    end or args['end_date'], step)
+    return parallel.run_forecasts(catalog, args, windows, seed=seed,
+                                  workers=workers,
+                                  chunk_size=args.get('chunk_size'),
+                                  folder=folder, cache=_result_cache(args),
+                                  region=region)
+
+
+def _result_cache(args):
+    """
+    Returns the result cache of the args' result_cache folder, if any, bounded
+    to result_cache_size MB (see results.ResultCache)
+    """
+    if not args.get('result_cache'):
+        return None
+    if args.get('result_cache_size') is None:
+        return ResultCache(args['result_cache'])
+    return ResultCache(args['result_cache'],
+                       int(args['result_cache_size'] * 2 ** 20))
+
+
+def make_forecast(input_catalog, args, n_sims=1000, seed=None, verbose=True,
+                  engine='vectorized', as_catalog=False, rng=None,
+                  region=None, profiler=None, cache=None):
     """
     Routine to create a forecast from an input catalog and argument dictionary
 
     Args:
-        input_catalog (list): A CSEP formatted events list (see libs.load_cat)
+        input_catalog (list, Catalog, CatalogIndex): A CSEP formatted events
+            list (see libs.load_cat), a columnar catalog or a time-sorted
+            index of it (see catalog.py). For repeated calls on the same
+            catalog, pass a CatalogIndex so the catalog is sorted only once.
         args (dict): Contains the arguments and its values
         n_sims (int): Number of stochastic catalogs to create
-        seed (int): seed for random number generation
+        seed (int): seed for random number generation (ignored if rng is
+            given)
         verbose (bool): Flag to print out the logging.
+        engine (str): Simulation engine. 'vectorized' (default) draws all the
+            synthetic events of the n_sims catalogs as whole arrays, whereas
+            'legacy' simulates event by event, reproducing exactly the output
+            of previous pymock versions for a given seed (provided the input
+            catalog is sorted by time).
+        as_catalog (bool): Returns the forecast as a columnar Catalog instead
+            of a list of events.
+        rng (numpy.random.Generator): (Optional) Source of random numbers.
+            The global numpy.random state is never used nor modified.
+        region (region.Region): (Optional) Returns the forecast as the mean
+            number of events per synthetic catalog within each cell of the
+            region grid and magnitude bin of the GR distribution (see
+            _mag_sampler), as an array of shape (n_cells, n_mag_bins).
+        profiler (profiling.Profiler): (Optional) Adds the model rates and
+            the number of events to the record of the running stage
+        cache (results.ResultCache): (Optional) Returns the forecast from the
+            result cache, if it was already made from the same input events
+            (before start_date), model arguments, n_sims, seed and engine.
+            Otherwise, the forecast is made and stored in the cache. Only
+            used if a seed is given, and no rng.
+    """
+    _check_engine(engine)
+    use_cache = cache is not None and seed is not None and rng is None
+
+    # Set pseudo-random number gen
+    rng = get_rng(seed, rng, engine)
+
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    model = _window_model(input_catalog, args)
+
+    if verbose:
+        print(
+            f"Making forecast with model parameters:\n {args.__str__()}\n"
+            f"and simulation parameters:\n"
+            f" n_sims:{locals()['n_sims']}\n"
+            f" seed:{locals()['seed']}")
+        print(f"\tmu: {model['mu']:.2e}\n\tlambda:{model['lambd']:.2e}")
+
+    forecast = None
+    if use_cache:
+        key = cache.key(input_catalog, args, n_sims, seed, engine)
+        forecast = cache.get(key)
+    if forecast is None:
+        forecast = _simulate(model, n_sims, engine, True, rng)
+        if use_cache:
+            cache.put(key, forecast)
+    if not (as_catalog or region is not None):
+        forecast = forecast.to_list()
+    if profiler is not None:
+        profiler.annotate(mu=model['mu'], lambd=model['lambd'],
+                          n_events=len(forecast))
+
+    # if verbose:
+    print(
+        f"\tTotal of {len(forecast)} events M>{model['mag_min']} in {n_sims}"
+        f' synthetic catalogs')
+    if region is not None:
+        return grid_counts(forecast, region, model['sampler'].bins) / n_sims
+    return forecast
+
+
+def iter_forecast(input_catalog, args, n_sims=1000, seed=None, chunk_size=1000,
+                  engine='vectorized', as_catalog=True, rng=None,
+                  profiler=None):
+    """
+    Creates a forecast as a stream of chunks of synthetic catalogs, so only
+    one chunk is held in memory at a time, regardless of n_sims. The stream
+    can be consumed directly by libs.write_forecast.
+
+    The chunks are simulated sequentially from the same random stream. With
+    the legacy engine, the concatenated chunks are identical to the output of
+    make_forecast for the same seed.
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            make_forecast)
+        args (dict): Contains the arguments and its values
+        n_sims (int): Number of stochastic catalogs to create
+        seed (int): seed for random number generation (ignored if rng is
+            given)
+        chunk_size (int): Number of synthetic catalogs per chunk
+        engine (str): Simulation engine (see make_forecast)
+        as_catalog (bool): Yields the chunks as columnar Catalogs (default),
+            or as lists of events
+        rng (numpy.random.Generator): (Optional) Source of random numbers
+        profiler (profiling.Profiler): (Optional) Adds the model rates to the
+            record of the running stage
+
+    Returns:
+        A generator of forecast chunks, whose catalog ids are numbered
+        consecutively across chunks.
+    """
+    _check_engine(engine)
+    rng = get_rng(seed, rng, engine)
+
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    model = _window_model(input_catalog, args)
+    if profiler is not None:
+        profiler.annotate(mu=model['mu'], lambd=model['lambd'])
+    return _iter_chunks(model, n_sims, chunk_size, engine, as_catalog, rng)
+
+
+def _iter_chunks(model, n_sims, chunk_size, engine, as_catalog, rng):
+    for first in range(0, n_sims, chunk_size):
+        chunk = _simulate(model, min(chunk_size, n_sims - first), engine,
+                          True, rng)
+        chunk.catalog_id += first
+        yield chunk if as_catalog else chunk.to_list()
+
+
+def make_forecasts(input_catalog, args, windows, n_sims=1000, seed=None,
+                   folder=None, verbose=False, engine='vectorized',
+                   as_catalog=False, rng=None):
+    """
+    Creates the forecasts of multiple time windows in one pass.
+
+    The input catalog is sorted and indexed once, and the magnitude
+    distribution is shared by all windows, so each window only costs its rate
+    computation (a few binary searches) and its simulation. The random
+    numbers of all windows are drawn sequentially from a single stream,
+    seeded once with seed (see parallel.run_forecasts for independent streams
+    per window).
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            make_forecast)
+        args (dict): Contains the arguments and its values. The start_date
+            and end_date of the forecast are taken from windows.
+        windows (list): A sequence of (start_date, end_date) windows (see
+            libs.forecast_windows)
+        n_sims (int): Number of stochastic catalogs to create per window
+        seed (int): seed for random number generation (ignored if rng is
+            given)
+        folder (str): (Optional) If given, each forecast is written to this
+            folder right after its simulation, instead of being returned, in
+            the args' output_format (see libs.write_forecast).
+        verbose (bool): Flag to print out the logging.
+        engine (str): Simulation engine (see make_forecast)
+        as_catalog (bool): Returns the forecasts as columnar Catalogs
+        rng (numpy.random.Generator): (Optional) Source of random numbers
+
+    Returns:
+        A list with the forecast of each window, or the list of the written
+        forecast files if folder is given.
+    """
+    _check_engine(engine)
+    rng = get_rng(seed, rng, engine)
+
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    output = []
+    for start, end in windows:
+        model = _window_model(input_catalog,
+                              {**args, 'start_date': start, 'end_date': end})
+        forecast = _simulate(model, n_sims, engine, as_catalog or bool(folder),
+                             rng)
+        if verbose:
+            print(f'\t{start.isoformat()} - {end.isoformat()}: '
+                  f'{len(forecast)} events in {n_sims} synthetic catalogs')
+        if folder:
+            fmt = args.get('output_format', 'csv')
+            libs.write_forecast(start, end, forecast, folder, fmt=fmt,
+                                level=args.get('compression_level'))
+            output.append(libs.syncat_path(start, end, folder, fmt=fmt))
+        else:
+            output.append(forecast)
+
+    return output
+
+
+def make_rates(input_catalog, args, n_sims=1000, seed=None, mag_hist=False,
+               rng=None):
+    """
+    Rates-only forecast: draws the number of events of each synthetic catalog,
+    without sampling their locations, times and magnitudes.
+
+    The counts are drawn as in the vectorized engine of make_forecast, so for
+    a given seed they are the numbers of events of the synthetic catalogs of
+    make_forecast(..., seed=seed).
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            make_forecast)
+        args (dict): Contains the arguments and its values
+        n_sims (int): Number of stochastic catalogs
+        seed (int): seed for random number generation (ignored if rng is
+            given)
+        mag_hist (bool): Also returns the number of events of each catalog
+            per magnitude bin of the GR distribution, drawn from a multinomial
+            distribution. The bins are those of the args' GR distribution
+            (see _mag_sampler), mag_bin_width wide from mag_min to mag_max.
+        rng (numpy.random.Generator): (Optional) Source of random numbers
+
+    Returns:
+        The number of events of each synthetic catalog, as an array of shape
+        (n_sims,). If mag_hist, a tuple of the counts and the magnitude
+        histograms, an array of shape (n_sims, n_mag_bins).
+    """
+    rng = get_rng(seed, rng)
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    model = _window_model(input_catalog, args)
+    return _simulate_rates(model, n_sims, mag_hist, rng)
+
+
+def make_window_rates(input_catalog, args, windows, n_sims=1000, seed=None,
+                      mag_hist=False, rng=None):
+    """
+    Rates-only forecasts (see make_rates) of multiple time windows, with the
+    input catalog indexed once and a single random stream (see
+    make_forecasts).
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            make_forecast)
+        args (dict): Contains the arguments and its values. The start_date
+            and end_date of the forecast are taken from windows.
+        windows (list): A sequence of (start_date, end_date) windows (see
+            libs.forecast_windows)
+        n_sims (int): Number of stochastic catalogs per window
+        seed (int): seed for random number generation (ignored if rng is
+            given)
+        mag_hist (bool): Also returns the magnitude histograms of the
+            catalogs (see make_rates)
+        rng (numpy.random.Generator): (Optional) Source of random numbers
+
+    Returns:
+        The number of events of each window and synthetic catalog, as an
+        array of shape (n_windows, n_sims). If mag_hist, a tuple of the counts
+        and the magnitude histograms, of shape (n_windows, n_sims,
+        n_mag_bins).
+    """
+    rng = get_rng(seed, rng)
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    counts, hists = [], []
+    for start, end in windows:
+        model = _window_model(input_catalog,
+                              {**args, 'start_date': start, 'end_date': end})
+        rates = _simulate_rates(model, n_sims, mag_hist, rng)
+        if mag_hist:
+            rates, hist = rates
+            hists.append(hist)
+        counts.append(rates)
+
+    counts = numpy.array(counts, dtype=int).reshape(len(counts), n_sims)
+    if mag_hist:
+        return counts, numpy.array(hists)
+    return counts
+
+
+def get_rng(seed=None, rng=None, engine='vectorized'):
+    """
+    Returns the source of random numbers of a simulation, which is local to
+    it (i.e., the global numpy.random state is not used).
+
+    Args:
+        seed (int): seed for random number generation
+        rng (numpy.random.Generator): If given, it is returned as is.
+        engine (str): Simulation engine. The vectorized engine uses a
+            Generator (PCG64), whereas the legacy engine uses a RandomState,
+            which for a given seed reproduces the random numbers formerly
+            drawn after numpy.random.seed(seed).
+    """
+    if rng is not None:
+        return rng
+    if engine == 'legacy':
+        return numpy.random.RandomState(seed)
+    return numpy.random.default_rng(seed)
+
+
+def _check_engine(engine):
+    if engine not in ('vectorized', 'legacy'):
+        raise ValueError(f"Simulation engine '{engine}' not recognized. "
+                         f"Use 'vectorized' or 'legacy'")
+
+
+def _window_model(index, args):
+    """
+    Computes the model parameters of a forecast time window: the background
+    and previous time-window rates, the parameters of the number-of-events
+    distribution, the catalogs to sample events from and the magnitude
+    distribution.
+
+    Args:
+        index (CatalogIndex): time-sorted index of the input catalog
+        args (dict): Contains the arguments and its values
+
+    Returns:
+        A dictionary with the window parameters
     """
     t0: datetime = args['start_date']
     end_date: datetime = args['end_date']
@@ -81,104 +604,301 @@ def make_forecast(input_catalog, args, n_sims=1000, seed=None, verbose=True):
     dist: str = args.get('distribution', 'poisson')
 
     # Predefine magnitude of completeness, Mc;
-    # will be used with b-value = 1 to scale BG activity from M >= Mc to M >= mag_min
+    # will be used with the GR b-value (default 1) to scale BG activity from
+    # M >= Mc to M >= mag_min
     #   (same optionally also for recent activity if 'apply_mc_to_lambda' is True)
     # Note: should not be too low/optimistic, otherwise this adjustment is flawed
     #       (due to incompleteness)
     mag_compl = 2.0  # (a conservative Mc estimate for ISIDE)
     mag_compl = args.get('mag_compl', mag_compl)
 
-    # Set seed for pseudo-random number gen
-    if seed:
-        numpy.random.seed(seed)
-
     # Filter catalog
-    cat_total = [i for i in input_catalog if i[3] < t0 and
-                 i[2] >= mag_compl]  # only above completeness lvl (for reasons mentioned above)
+    # only above completeness lvl (for reasons mentioned above)
+    cat_total = index.events_before(t0, mag_compl)
     mag_thresh_prev = mag_compl if args.get('apply_mc_to_lambda', False) else mag_min  # (see above)
-    catalog_prev = [i for i in cat_total if t0 - dt_prev <= i[3] and
-                    i[2] >= mag_thresh_prev]
+    catalog_prev = index.events_between(
+        t0 - dt_prev, t0, max(mag_compl, mag_thresh_prev))
+    # Their positions in the input catalog, for the legacy engine
+    positions = (index.positions_before(t0, mag_compl),
+                 index.positions_between(t0 - dt_prev, t0,
+                                         max(mag_compl, mag_thresh_prev)))
 
     # Previous time-window rate (normalized to forecast length)
     lambd = len(catalog_prev) / dt_prev.total_seconds() * dt_forecast.total_seconds()
-    lambd *= 10 ** (mag_thresh_prev - mag_min)  # correct to mag_min using b-value of 1 (see above)
+    b_value = args.get('b_value', 1.0)
+    # correct to mag_min using the b-value (see above)
+    lambd *= 10 ** (b_value * (mag_thresh_prev - mag_min))
 
     # Background rate (normalized to forecast length)
     mu_total = len(cat_total) * dt_forecast.total_seconds() / (
-        t0 - min([i[3] for i in cat_total])).total_seconds()
+        (datetime_to_epoch(t0) - cat_total.time[0]) / 1e6)
 
-    mu = mu_total * 10 ** (mag_compl - mag_min)  # scale by GR with b=1
+    mu = mu_total * 10 ** (b_value * (mag_compl - mag_min))  # scale by GR
 
+    # Parameters of the number-of-events distribution, as (bg, recent)
+    params = ((mu,), (lambd,))
     if dist == 'negbinom':
-        cat_total_mag = [j for j in cat_total if j[2] >= mag_min]
-        times = [i[3] for i in cat_total_mag]
-        timewindows = numpy.arange(min(times).date(), max(times).date(), dt_forecast)
-        counts, _ = numpy.histogram(times, timewindows)
+        # Counts of past events in windows of the forecast length, memoized
+        # by the index for consecutive forecast windows
+        counts = index.window_counts(t0, dt_forecast, max(mag_compl, mag_min))
         var = numpy.var(counts)
         alpha = (var - mu) / mu ** 2
         tau_bg = 1. / alpha * mu
         theta_bg = tau_bg / (tau_bg + mu)
+        params = ((tau_bg, theta_bg), None)
 
         if lambd != 0:
             tau = 1. / alpha * lambd
             theta = tau / (tau + lambd)
+            params = ((tau_bg, theta_bg), (tau, theta))
 
-    if verbose:
-        print(
-            f"Making forecast with model parameters:\n {args.__str__()}\n"
-            f"and simulation parameters:\n"
-            f" n_sims:{locals()['n_sims']}\n"
-            f" seed:{locals()['seed']}")
-        print(f'\tmu: {mu:.2e}\n\tlambda:{lambd:.2e}')
+    # Gutenberg-Richter (GR) distribution, shared by all windows
+    sampler = _mag_sampler(args)
+
+    return {'t0': t0, 'dt_forecast': dt_forecast, 'mag_min': mag_min,
+            'mu': mu, 'lambd': lambd, 'dist': dist, 'params': params,
+            'cat_total': cat_total, 'catalog_prev': catalog_prev,
+            'positions': positions, 'sampler': sampler}
+
+
+def _mag_sampler(args):
+    """
+    Returns the (cached) GR magnitude sampler of the arguments: magnitudes
+    from mag_min to mag_max (default 8.0) in bins of mag_bin_width (default
+    0.1), with b_value (default 1), and continuous if continuous_mags.
+    """
+    return gr_sampler(args.get('mag_min', 4.0), args.get('b_value', 1.0),
+                      args.get('mag_max', 8.0),
+                      args.get('mag_bin_width', 0.1),
+                      args.get('continuous_mags', False))
 
+
+def _simulate(model, n_sims, engine, as_catalog, rng):
+    """
+    Simulates the synthetic catalogs of a time window with a given engine.
+    Random numbers are drawn from rng, either a Generator or a RandomState.
+    """
     # -- Simulating events
     # The model creates a random selection of N events from the input_catalog,
     # e.g., a simulated catalog has N_events ~ Poisson(rate_prevday)
+    simulate = _simulate_legacy if engine == 'legacy' else _simulate_vectorized
+    cat_total, catalog_prev = model['cat_total'], model['catalog_prev']
+    if engine == 'legacy':
+        # Events are sampled by their position in the input catalog, which
+        # may not be sorted by time
+        cat_total, catalog_prev = (
+            _input_order(i, pos) for i, pos in
+            zip((cat_total, catalog_prev), model['positions']))
+    forecast = simulate(cat_total, catalog_prev,
+                        model['dist'], model['params'], model['sampler'],
+                        model['t0'], model['dt_forecast'],
+                        n_sims, rng)
+    # Datetimes are only created at the output, for the list format
+    return forecast if as_catalog else forecast.to_list()
+
+
+def _input_order(events, positions):
+    """
+    Returns the events of a time-sorted query of a CatalogIndex in the order
+    of the input catalog, given their positions in it
+    """
+    if numpy.all(positions[1:] > positions[:-1]):
+        return events
+    return events[numpy.argsort(positions, kind='stable')]
+
+
+def _simulate_rates(model, n_sims, mag_hist, rng):
+    """
+    Draws the number of events of the synthetic catalogs of a time window,
+    and optionally their magnitude histograms
+    """
+    counts = (_draw_counts(rng, model['dist'], model['params'][0], n_sims) +
+              _draw_counts(rng, model['dist'], model['params'][1], n_sims))
+    if not mag_hist:
+        return counts
+    return counts, rng.multinomial(counts, model['sampler'].prob)
+
+
+def _draw_counts(rng, dist, params, size=None):
+    """
+    Draws the number of events of synthetic catalogs from either a Poisson or
+    a negative binomial distribution. A None set of parameters (i.e. a
+    negative binomial with null rate) yields no events.
+    """
+    if params is None:
+        return 0 if size is None else numpy.zeros(size, dtype=int)
+    if dist == 'poisson':
+        return rng.poisson(*params, size=size)
+    elif dist == 'negbinom':
+        return rng.negative_binomial(*params, size=size)
+
+
+def _draw_integers(rng, high, size):
+    """
+    Draws integers in [0, high), with either a Generator or the legacy
+    RandomState interface
+    """
+    if isinstance(rng, numpy.random.Generator):
+        return rng.integers(0, high, size=size)
+    return rng.randint(0, high, size=size)
 
-    # Create Gutenberg-Richter (GR) distribution
-    mag_bins = numpy.arange(mag_min, 8.1, 0.1)
-    prob_mag = 10 ** (-mag_bins[:-1]) - 10 ** (-mag_bins[1:])  # GR with b=1
-    prob_mag /= numpy.sum(prob_mag)
 
-    forecast = []
+def _simulate_legacy(cat_total, catalog_prev, dist, params, sampler, t0,
+                     dt_forecast, n_sims, rng):
+    """
+    Simulates the synthetic catalogs one event at a time, drawing the random
+    numbers in the same order as the original pymock implementation. Event
+    times are computed in epoch microseconds, rounded exactly as
+    t0 + random() * dt_forecast would be, and the events are returned as a
+    Catalog.
+    """
+    # Events are sampled as rows of (lon, lat, depth)
+    pool_bg = list(zip(cat_total.lon.tolist(), cat_total.lat.tolist(),
+                       cat_total.depth.tolist()))
+    pool_prev = list(zip(catalog_prev.lon.tolist(), catalog_prev.lat.tolist(),
+                         catalog_prev.depth.tolist()))
+    t0_us = datetime_to_epoch(t0)
+    dt_us = dt_forecast // timedelta(microseconds=1)
+
+    events, mags, times, catalog_ids, event_ids = [], [], [], [], []
     for n_cat in range(n_sims):
-        if dist == 'poisson':
-            n_events_bg = numpy.random.poisson(mu)
-            n_events = numpy.random.poisson(lambd)
-
-        elif dist == 'negbinom':
-            n_events_bg = numpy.random.negative_binomial(tau_bg, theta_bg)
-            if lambd != 0:
-                n_events = numpy.random.negative_binomial(tau, theta)
-            else:
-                n_events = 0
+        n_events_bg = _draw_counts(rng, dist, params[0])
+        n_events = _draw_counts(rng, dist, params[1])
 
         # Sample BG events
-        idx_bg = numpy.random.choice(range(len(cat_total)), size=n_events_bg)
-        random_cat = [cat_total[i] for i in idx_bg]
+        idx_bg = rng.choice(range(len(cat_total)), size=n_events_bg)
+        random_cat = [pool_bg[i] for i in idx_bg]
 
         # Sample from recent seismicity
-        idx = numpy.random.choice(range(len(catalog_prev)), size=n_events)
-        random_cat.extend([catalog_prev[i] for i in idx])
+        idx = rng.choice(range(len(catalog_prev)), size=n_events)
+        random_cat.extend([pool_prev[i] for i in idx])
 
         for i, event in enumerate(random_cat):
             # Locations remain the same as in the randomly sampled catalog
 
-            mag = numpy.random.choice(mag_bins[:-1], p=prob_mag)  # sample from GR
-            t = t0 + numpy.random.random() * dt_forecast  # random datetime between t0 and end_date
+            if sampler.continuous:
+                mag = sampler.sample(rng)
+            else:
+                # sample from GR
+                mag = rng.choice(sampler.bins[:-1], p=sampler.prob)
+            # random time between t0 and end_date
+            u, v = rng.random().as_integer_ratio()
 
-            forecast.append([*event[0:2], mag, t, event[4], n_cat, i])
+            events.append(event)
+            mags.append(mag)
+            times.append(t0_us + _round_div(dt_us * u, v))
+            catalog_ids.append(n_cat)
+            event_ids.append(i)
 
-    # if verbose:
-    print(
-        f'\tTotal of {len(forecast)} events M>{mag_min} in {n_sims}'
-        f' synthetic catalogs')
-    return forecast
+    if not events:
+        return Catalog.empty()
+    lon, lat, depth = zip(*events)
+    return Catalog(lon, lat, mags, times, depth, catalog_ids, event_ids)
+
+
+def _round_div(a, b):
+    """
+    Integer division a / b (b > 0) rounded half to even, as timedelta
+    multiplication rounds to microseconds
+    """
+    q, r = divmod(a, b)
+    if 2 * r > b or (2 * r == b and q % 2):
+        q += 1
+    return q
+
+
+def _simulate_vectorized(cat_total, catalog_prev, dist, params, sampler,
+                         t0, dt_forecast, n_sims, rng):
+    """
+    Simulates all the synthetic catalogs at once. The number of events of
+    every catalog, the sampled background/recent events, magnitudes and times
+    are drawn as arrays for the whole batch. Within each synthetic catalog,
+    the background events precede the recent-seismicity events, as in the
+    legacy engine.
+    """
+    n_bg = _draw_counts(rng, dist, params[0], size=n_sims)
+    n_prev = _draw_counts(rng, dist, params[1], size=n_sims)
+    n_events = n_bg + n_prev
+    n_total = int(n_events.sum())
+
+    # Positions of the background/recent events in the forecast
+    start = numpy.cumsum(n_events) - n_events
+    pos_bg = numpy.arange(n_bg.sum()) + numpy.repeat(
+        start - (numpy.cumsum(n_bg) - n_bg), n_bg)
+    pos_prev = numpy.arange(n_prev.sum()) + numpy.repeat(
+        start + n_bg - (numpy.cumsum(n_prev) - n_prev), n_prev)
+
+    # Locations remain the same as in the randomly sampled catalogs
+    lon, lat, depth = (numpy.empty(n_total) for _ in range(3))
+    for pool, pos in ((cat_total, pos_bg), (catalog_prev, pos_prev)):
+        if pos.size:
+            idx = _draw_integers(rng, len(pool), size=pos.size)
+            lon[pos] = pool.lon[idx]
+            lat[pos] = pool.lat[idx]
+            depth[pos] = pool.depth[idx]
+
+    # Sample magnitudes from GR by inverting its cumulative distribution
+    mags = sampler.sample(rng, n_total)
+
+    # Random times between t0 and end_date, at microsecond resolution
+    dt_us = dt_forecast / timedelta(microseconds=1)
+    times = datetime_to_epoch(t0) + numpy.rint(
+        rng.random(n_total) * dt_us).astype(numpy.int64)
+
+    catalog_ids = numpy.repeat(numpy.arange(n_sims), n_events)
+    event_ids = numpy.arange(n_total) - numpy.repeat(start, n_events)
+
+    return Catalog(lon, lat, mags, times, depth, catalog_ids, event_ids)
 
 
 def run():
     """
     Advanced usage for command entry point (see setup.cfg, entry_points)
     """
-    args = sys.argv
-    main(*args[1:])
+    parser = argparse.ArgumentParser(
+        prog='pymock', description='Creates a pymock forecast.')
+    parser.add_argument('arg_path', nargs='?', default=None,
+                        help='Arguments file (default input/args.txt)')
+    parser.add_argument('folder', nargs='?', default=None,
+                        help='Output folder (default forecasts)')
+    parser.add_argument('--verbose', action='store_true', help='Print log')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print the time and peak memory of each stage, '
+                             'and write them to a json file')
+    windows = parser.add_argument_group(
+        'date range', 'Forecasts consecutive windows between two dates in a '
+                      'single run, instead of the window of the arguments '
+                      'file')
+    windows.add_argument('--start', type=datetime.fromisoformat,
+                         default=None,
+                         help='Start date of the first window. Defaults to '
+                              'the start_date of the arguments file.')
+    windows.add_argument('--end', type=datetime.fromisoformat, default=None,
+                         help='End date of the last window. Defaults to the '
+                              'end_date of the arguments file.')
+    windows.add_argument('--step', type=float, default=None,
+                         help='Window length in days (default 1)')
+    windows.add_argument('--seed', type=int, default=None,
+                         help='Root seed, from which the seed of each window '
+                              'is derived. Defaults to the arguments file '
+                              'seed.')
+    windows.add_argument('--workers', type=int, default=None,
+                         help='Number of processes (default 1)')
+    options = parser.parse_args(sys.argv[1:])
+
+    if options.start or options.end:
+        if options.verbose or options.profile:
+            parser.error('--verbose and --profile apply to a single window, '
+                         'not to a date range (--start/--end)')
+        files = main_windows(options.arg_path, options.folder,
+                             options.start, options.end,
+                             options.step or 1, options.seed,
+                             options.workers or 1)
+        print(f'{len(files)} forecasts written')
+    else:
+        if any(i is not None for i in (options.step, options.seed,
+                                       options.workers)):
+            parser.error('--step, --seed and --workers apply to a date range '
+                         '(--start/--end)')
+        main(options.arg_path, options.folder, verbose=options.verbose,
+             profile=options.profile)
@@ -0,0 +1,189 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy
+
+from pymock import libs, main
+from pymock.catalog import Catalog, CatalogIndex
+
+# Catalog index and testing region of a worker process, set once by its
+# initializer
+_worker_index = None
+_worker_region = None
+
+
+def run_forecasts(input_catalog, args, windows, n_sims=None, seed=None,
+                  workers=None, chunk_size=None, folder=None,
+                  engine='vectorized', as_catalog=False, cache=None,
+                  region=None):
+    """
+    Creates the forecasts of multiple time windows over a pool of processes.
+
+    Each window, and optionally each chunk of chunk_size synthetic catalogs
+    within a window, is an independent task with its own random Generator.
+    The Generators are spawned from a SeedSequence rooted at seed, keyed on
+    the window dates and the chunk position (see window_seed). Therefore, the
+    results are bit-identical regardless of the number of workers, and a
+    window's forecast does not depend on the other windows of the run (but it
+    does on chunk_size).
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            main.make_forecast)
+        args (dict): Contains the arguments and its values. The start_date
+            and end_date of the forecast are taken from windows.
+        windows (list): A sequence of (start_date, end_date) windows (see
+            libs.forecast_windows)
+        n_sims (int): Number of stochastic catalogs per window. Defaults to
+            the args' n_sims, or 1000.
+        seed (int): Root seed of the random streams. Defaults to the args'
+            seed, or to fresh entropy from the OS.
+        workers (int): Number of processes. Defaults to the number of CPUs.
+            With 1 worker, the tasks run in the current process.
+        chunk_size (int): (Optional) Splits the n_sims catalogs of every
+            window into tasks of chunk_size catalogs.
+        folder (str): (Optional) If given, the forecasts are written to this
+            folder instead of being returned, in the args' output_format,
+            with their gridded rates over region, if given (see
+            main.write_window).
+        engine (str): Simulation engine (see main.make_forecast)
+        as_catalog (bool): Returns the forecasts as columnar Catalogs
+        cache (results.ResultCache): (Optional) Takes the windows (and
+            chunks) already forecast from the result cache, and stores the
+            others in it, so a re-run or resumed run only simulates the
+            missing windows. Only used if a seed is given.
+        region (region.Region): (Optional) Testing region of the written
+            forecasts (see folder)
+
+    Returns:
+        A list with the forecast of each window, or the list of the written
+        forecast files if folder is given.
+    """
+    main._check_engine(engine)
+    if n_sims is None:
+        n_sims = args.get('n_sims', 1000)
+    if seed is None:
+        seed = args.get('seed', None)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = n_sims
+
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    tasks = _make_tasks(args, windows, n_sims, seed, chunk_size, folder,
+                        engine, cache)
+
+    if workers == 1:
+        results = [_forecast_task(input_catalog, task, region)
+                   for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(input_catalog.catalog,
+                                           region)) as pool:
+            results = list(pool.map(_worker_task, tasks))
+
+    # Gather the chunks of each window
+    output = []
+    n_chunks = math.ceil(n_sims / chunk_size) if n_sims else 1
+    for i, (start, end) in enumerate(windows):
+        chunks = results[i * n_chunks:(i + 1) * n_chunks]
+        if folder and n_chunks == 1:
+            output.append(chunks[0])  # already written by the task
+            continue
+        forecast = Catalog.concatenate(chunks)
+        if folder:
+            window_args = {**args, 'start_date': start, 'end_date': end}
+            main.write_window(forecast, window_args, folder, region, n_sims)
+            output.append(libs.syncat_path(
+                start, end, folder, fmt=args.get('output_format', 'csv')))
+        else:
+            output.append(forecast if as_catalog else forecast.to_list())
+
+    return output
+
+
+def _make_tasks(args, windows, n_sims, seed, chunk_size, folder, engine,
+                cache=None):
+    """
+    Creates the tasks of all windows and chunks, each with its own
+    SeedSequence spawned from the root seed
+    """
+    n_chunks = math.ceil(n_sims / chunk_size) if n_sims else 1
+    write = folder if n_chunks == 1 else None
+    if seed is None:
+        cache = None  # fresh entropy, never reproduced
+
+    tasks = []
+    root = numpy.random.SeedSequence(seed)
+    for start, end in windows:
+        window_args = {**args, 'start_date': start, 'end_date': end}
+        seed_seq = window_seed(root.entropy, start, end)
+        for n_chunk, chunk_seed in enumerate(seed_seq.spawn(n_chunks)):
+            first = n_chunk * chunk_size
+            size = min(chunk_size, n_sims - first)
+            tasks.append((window_args, first, size, chunk_seed, engine,
+                          write, cache))
+    return tasks
+
+
+def window_seed(seed, start, end):
+    """
+    Returns the SeedSequence of a forecast window, derived from a root seed
+    and keyed on the window's start and end dates. Different windows get
+    independent (non-colliding) random streams.
+
+    Args:
+        seed (int): Root seed (e.g. the args file seed)
+        start (datetime): Start date of the window
+        end (datetime): End date of the window
+    """
+    key = tuple((i - datetime.min) // datetime.resolution for i in
+                (start, end))
+    return numpy.random.SeedSequence(seed, spawn_key=key)
+
+
+def _forecast_task(index, task, region=None):
+    """
+    Simulates a chunk of synthetic catalogs of a window, or takes it from the
+    result cache. Returns the chunk as a Catalog, or the forecast file path
+    if the task writes it (with its gridded rates over region, if given).
+    """
+    args, first, size, seed_seq, engine, folder, cache = task
+    start, end = args['start_date'], args['end_date']
+    fmt = args.get('output_format', 'csv')
+
+    forecast = None
+    if cache is not None:
+        key = cache.key(index, args, size, seed_seq, engine, first)
+        if folder and fmt == 'npy' and region is None:
+            path = libs.syncat_path(start, end, folder, fmt=fmt)
+            if cache.link(key, path):
+                return path
+        forecast = cache.get(key)
+    if forecast is None:
+        rng = numpy.random.default_rng(seed_seq)
+        model = main._window_model(index, args)
+        forecast = main._simulate(model, size, engine, True, rng)
+        forecast.catalog_id += first
+        if cache is not None:
+            cache.put(key, forecast)
+
+    if folder:
+        main.write_window(forecast, args, folder, region, size)
+        return libs.syncat_path(start, end, folder, fmt=fmt)
+    return forecast
+
+
+def _init_worker(catalog, region=None):
+    global _worker_index, _worker_region
+    _worker_index = CatalogIndex(catalog)
+    _worker_region = region
+
+
+def _worker_task(task):
+    return _forecast_task(_worker_index, task, _worker_region)
@@ -0,0 +1,127 @@
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class Profiler:
+    """
+    Instruments the stages of a forecast run (see main.main).
+
+    Each stage produces a record (dict) with its name, wall time and,
+    optionally, peak memory, plus any information added while it runs (e.g.
+    number of events, rates, bytes written). Records are collected in
+    records, and passed to every hook as soon as their stage ends.
+
+    Args:
+        hooks (list): Callables that receive each record
+        memory (bool): Also measures the peak memory allocated by python
+            within each stage (tracemalloc, which slows down allocations),
+            and the peak resident memory of the process.
+    """
+
+    def __init__(self, hooks=(), memory=False):
+        self.hooks = list(hooks)
+        self.memory = memory
+        self.records = []
+        self._current = None
+
+    @contextlib.contextmanager
+    def stage(self, name, **info):
+        """
+        Context manager that times a stage and emits its record on exit. The
+        time spent in streams consumed within the stage (see iterate) is
+        excluded from it.
+        """
+        record = {'stage': name, **info}
+        parent, self._current = self._current, record
+        if self.memory:
+            started = tracemalloc.is_tracing()
+            if not started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start - \
+                record.pop('_stream_seconds', 0.)
+            if self.memory:
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                if not started:
+                    tracemalloc.stop()
+                record['max_rss'] = max_rss()
+            self._current = parent
+            self.emit(record)
+
+    def annotate(self, **info):
+        """
+        Adds information to the record of the running stage, if any
+        """
+        if self._current is not None:
+            self._current.update(info)
+
+    def iterate(self, name, iterable):
+        """
+        Passes through the chunks of a stream (e.g. of forecast chunks),
+        timing only their production and counting their events. The record
+        of the stage is emitted once the stream is exhausted.
+        """
+        record = {'stage': name, 'seconds': 0., 'n_chunks': 0, 'n_events': 0}
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                record['seconds'] += time.perf_counter() - start
+                break
+            record['seconds'] += time.perf_counter() - start
+            record['n_chunks'] += 1
+            record['n_events'] += len(item)
+            yield item
+        if self._current is not None:
+            self._current['_stream_seconds'] = \
+                self._current.get('_stream_seconds', 0.) + record['seconds']
+        self.emit(record)
+
+    def emit(self, record):
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def dump(self, path):
+        """
+        Writes the records as a JSON file
+        """
+        with open(path, 'w') as f_:
+            json.dump(self.records, f_, indent=2, default=str)
+
+    def summary(self):
+        """
+        Returns a table of the stages, for printing
+        """
+        lines = []
+        for record in self.records:
+            line = f"\t{record['stage']:<12} {record['seconds']:9.4f} s"
+            if 'peak_memory' in record:
+                line += f" {record['peak_memory'] / 2 ** 20:9.1f} MiB peak"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def max_rss():
+    """
+    Peak resident memory of the process in bytes, or None if unknown
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS, and in kilobytes on Linux
+    return rss if sys.platform == 'darwin' else rss * 1024
@@ -0,0 +1,252 @@
+import os
+
+import numpy
+
+from pymock import libs
+
+
+class Region:
+    """
+    Testing region, defined by a lon/lat polygon, and the regular grid of
+    cells of size dh whose centers lie inside the polygon (as the gridded
+    regions of CSEP).
+
+    Cells are numbered in the order of their lower-left corners (see
+    origins), sorted by longitude and then by latitude.
+
+    The grid also serves as a lookup cache to test whether points are inside
+    the polygon (see contains): the cells that are not crossed by the
+    polygon's boundary are classified once as inside or outside, so only the
+    points within boundary cells are tested against the polygon edges.
+
+    Args:
+        polygon (array): Vertices of the polygon, as (lon, lat) rows
+        dh (float): Cell size, in degrees
+    """
+
+    def __init__(self, polygon, dh=0.1):
+        self.polygon = numpy.asarray(polygon, dtype=numpy.float64)
+        self.dh = dh
+
+        # Grid covering the bounding box of the polygon, in cell units
+        self._k0 = numpy.floor(_cell_units(self.polygon.min(axis=0),
+                                           dh)).astype(int)
+        k1 = numpy.ceil(_cell_units(self.polygon.max(axis=0),
+                                    dh)).astype(int)
+        self.shape = tuple(int(i) for i in k1 - self._k0)
+
+        ix, iy = numpy.indices(self.shape).reshape(2, -1)
+        inside = points_in_polygon((self._k0[0] + ix + 0.5) * dh,
+                                   (self._k0[1] + iy + 0.5) * dh,
+                                   self.polygon)
+        self._cells = numpy.full(self.shape, -1)
+        self._cells[ix[inside], iy[inside]] = numpy.arange(inside.sum())
+        self.origins = numpy.column_stack([self._k0[0] + ix[inside],
+                                           self._k0[1] + iy[inside]]) * dh
+
+        # Lookup of the grid cells: 0 outside, 1 inside, 2 boundary
+        self._states = numpy.where(self._boundary_cells(), 2,
+                                   inside.reshape(self.shape)).astype(
+                                       numpy.int8)
+
+    @classmethod
+    def from_file(cls, path, dh=0.1):
+        """
+        Reads a region from a file of lon, lat polygon vertices (one per
+        line, separated by blanks, e.g. examples/case_1/input/region)
+        """
+        return cls(numpy.loadtxt(path, ndmin=2), dh)
+
+    def __len__(self):
+        return self.origins.shape[0]
+
+    def cell_index(self, lon, lat):
+        """
+        Returns the index of the grid cell of each point, or -1 for the points
+        outside the region grid
+        """
+        ix, iy, valid = self._grid_index(lon, lat)
+        index = numpy.full(ix.shape, -1)
+        index[valid] = self._cells[ix[valid], iy[valid]]
+        return index
+
+    def contains(self, lon, lat):
+        """
+        Tests whether points are inside the region polygon, vectorized over
+        the points. Points outside the bounding box of the polygon, or within
+        grid cells entirely inside or outside of it, are resolved from the
+        cell lookup. Only the points within cells crossed by the polygon's
+        boundary are tested against its edges (see points_in_polygon).
+
+        Args:
+            lon, lat (array): Coordinates of the points
+
+        Returns:
+            A boolean array
+        """
+        lon = numpy.asarray(lon, dtype=numpy.float64)
+        lat = numpy.asarray(lat, dtype=numpy.float64)
+        ix, iy, valid = self._grid_index(lon, lat)
+        states = numpy.zeros(lon.shape, dtype=numpy.int8)
+        states[valid] = self._states[ix[valid], iy[valid]]
+
+        inside = states == 1
+        boundary = states == 2
+        inside[boundary] = points_in_polygon(lon[boundary], lat[boundary],
+                                             self.polygon)
+        return inside
+
+    def filter(self, catalog):
+        """
+        Returns the events of a catalog inside the region polygon
+        """
+        return catalog[self.contains(catalog.lon, catalog.lat)]
+
+    def _grid_index(self, lon, lat):
+        """
+        Returns the grid position of points, and whether they are within the
+        grid
+        """
+        ix = numpy.floor(_cell_units(lon, self.dh)).astype(int) - \
+            self._k0[0]
+        iy = numpy.floor(_cell_units(lat, self.dh)).astype(int) - \
+            self._k0[1]
+        valid = (ix >= 0) & (ix < self.shape[0]) & \
+                (iy >= 0) & (iy < self.shape[1])
+        return ix, iy, valid
+
+    def _boundary_cells(self):
+        """
+        Flags the grid cells crossed by the polygon's boundary. The edges are
+        sampled every quarter of a cell, and the flagged cells are dilated by
+        one cell, so cells only clipped by an edge between samples are also
+        flagged.
+        """
+        boundary = numpy.zeros(self.shape, dtype=bool)
+        vertices = numpy.vstack([self.polygon, self.polygon[:1]])
+        for p1, p2 in zip(vertices[:-1], vertices[1:]):
+            n_samples = int(numpy.ceil(4 * numpy.abs(p2 - p1).max() /
+                                       self.dh)) + 1
+            points = p1 + numpy.linspace(0, 1, n_samples)[:, None] * (p2 - p1)
+            ix, iy, valid = self._grid_index(points[:, 0], points[:, 1])
+            boundary[ix[valid], iy[valid]] = True
+
+        dilated = boundary.copy()
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                dilated[max(dx, 0):self.shape[0] + min(dx, 0),
+                        max(dy, 0):self.shape[1] + min(dy, 0)] |= \
+                    boundary[max(-dx, 0):self.shape[0] + min(-dx, 0),
+                             max(-dy, 0):self.shape[1] + min(-dy, 0)]
+        return dilated
+
+
+def points_in_polygon(lon, lat, polygon):
+    """
+    Tests whether points are inside a polygon (even-odd rule), vectorized
+    over the points.
+
+    Args:
+        lon, lat (array): Coordinates of the points
+        polygon (array): Vertices of the polygon, as (lon, lat) rows
+
+    Returns:
+        A boolean array
+    """
+    lon = numpy.asarray(lon, dtype=numpy.float64)
+    lat = numpy.asarray(lat, dtype=numpy.float64)
+    polygon = numpy.asarray(polygon, dtype=numpy.float64)
+
+    inside = numpy.zeros(lon.shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, numpy.roll(polygon, -1, axis=0)):
+        if y1 == y2:
+            continue  # horizontal edges are never crossed
+        crosses = (y1 > lat) != (y2 > lat)
+        x_cross = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lon < x_cross)
+    return inside
+
+
+def grid_counts(catalog, region, mag_bins=None):
+    """
+    Counts the events of a catalog within each cell of a region grid, and
+    optionally within magnitude bins. Events outside the region are
+    ignored, and events above the last magnitude bin are counted in it.
+
+    Args:
+        catalog (Catalog): Events (e.g. a forecast's synthetic catalogs)
+        region (Region): The testing region
+        mag_bins (array): (Optional) Edges of the magnitude bins
+
+    Returns:
+        An integer array of shape (n_cells,), or (n_cells, n_mag_bins)
+    """
+    cells = region.cell_index(catalog.lon, catalog.lat)
+    if mag_bins is None:
+        return numpy.bincount(cells[cells >= 0], minlength=len(region))
+
+    n_mags = len(mag_bins) - 1
+    mags = numpy.searchsorted(mag_bins, catalog.mag, side='right') - 1
+    valid = (cells >= 0) & (mags >= 0)
+    bins = cells[valid] * n_mags + numpy.minimum(mags[valid], n_mags - 1)
+    return numpy.bincount(bins, minlength=len(region) * n_mags).reshape(
+        len(region), n_mags)
+
+
+def grid_path(start, end, folder):
+    """
+    Returns the file path of the gridded rates of a forecast (see
+    libs.syncat_path)
+    """
+    return os.path.splitext(libs.syncat_path(start, end, folder))[0] + \
+        '_grid.dat'
+
+
+def write_gridded_rates(path, region, rates, mag_bins=None,
+                        depth=(0., 30.), sparse=False):
+    """
+    Writes gridded rates in the CSEP ascii format, with one row per region
+    cell and magnitude bin:
+        lon_min, lon_max, lat_min, lat_max, depth_min, depth_max, mag_min,
+        mag_max, rate, flag
+
+    The file is gzip compressed if path ends with .gz.
+
+    Args:
+        path (str): Path of the output file
+        region (Region): The testing region
+        rates (array): Rates of shape (n_cells,), or (n_cells, n_mag_bins)
+        mag_bins (array): Edges of the magnitude bins, if any
+        depth (tuple): Depth range of the cells
+        sparse (bool): Writes only the rows of non-zero rate, the cells and
+            bins missing from the file having a zero rate. The file is then
+            much smaller, but it no longer describes the whole region, which
+            the CSEP readers of gridded forecasts build from its rows.
+    """
+    rates = numpy.asarray(rates, dtype=numpy.float64).reshape(len(region),
+                                                              -1)
+    n_mags = rates.shape[1]
+    if mag_bins is None:
+        mag_bins = numpy.array([-numpy.inf, numpy.inf])
+    mag_bins = numpy.asarray(mag_bins, dtype=numpy.float64)
+
+    origins = numpy.repeat(region.origins, n_mags, axis=0)
+    mags = numpy.tile(numpy.column_stack([mag_bins[:-1], mag_bins[1:]]),
+                      (len(region), 1))
+    table = numpy.column_stack([
+        origins[:, 0], origins[:, 0] + region.dh,
+        origins[:, 1], origins[:, 1] + region.dh,
+        numpy.full((len(origins), 2), depth), mags,
+        rates.ravel(), numpy.ones(len(origins))])
+    if sparse:
+        table = table[rates.ravel() != 0]
+    numpy.savetxt(path, table, fmt=['%.10g'] * 8 + ['%.6g', '%d'])
+
+
+def _cell_units(values, dh):
+    """
+    Converts coordinates to units of the cell size. The result is rounded to
+    1e-9 cells, so points on the cell edges (e.g. 12.3 / 0.1 =
+    122.99999999999999) are binned into the cell they start, as in pyCSEP.
+    """
+    return numpy.round(numpy.asarray(values, dtype=numpy.float64) / dh, 9)
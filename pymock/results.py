@@ -0,0 +1,179 @@
+"""
+Content-addressed cache of forecast results, to skip the windows already
+forecast when an experiment is re-run or resumed (e.g. a multi-year hindcast
+stopped halfway).
+
+A forecast is deterministic given the input events before its start date,
+the model arguments, the number of synthetic catalogs, the seed and the
+simulation engine (and the pymock version), so its cache key is a hash of
+them. Forecasts are stored as binary .npy files (see libs.save_forecast),
+and the least recently used ones are evicted once the cache exceeds its
+size.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy
+
+import pymock
+from pymock import libs
+from pymock.catalog import Catalog
+
+# Arguments that define the model of a forecast window (see
+# main._window_model)
+MODEL_ARGS = ('start_date', 'end_date', 'mag_min', 'distribution',
+              'lookback_days', 'mag_compl', 'apply_mc_to_lambda', 'b_value',
+              'mag_max', 'mag_bin_width', 'continuous_mags')
+
+
+class ResultCache:
+    """
+    Folder of cached forecasts, bounded in size with a least recently used
+    (LRU) eviction policy: the modification time of a cached file is updated
+    whenever it is used, and the oldest files are removed when the folder
+    exceeds max_bytes.
+
+    Entries are written atomically, so the cache can be shared by concurrent
+    processes (e.g. the workers of parallel.run_forecasts). The size of the
+    folder is scanned once, then kept as a running total of the stored
+    forecasts, and rescanned only when it exceeds max_bytes, so the entries
+    of other processes are accounted for at the next eviction.
+
+    Args:
+        folder (str): Folder of the cached forecasts
+        max_bytes (int): Maximum size of the cached forecasts, in bytes.
+            Defaults to 1 GiB.
+    """
+
+    def __init__(self, folder, max_bytes=2 ** 30):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._size = None
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, index, args, n_sims, seed, engine='vectorized', first=0):
+        """
+        Returns the key of a forecast: the sha1 hash of the input events
+        before its start date, its model arguments (see MODEL_ARGS), number
+        of synthetic catalogs, seed, engine and the pymock version.
+
+        Args:
+            index (CatalogIndex): The time-sorted input catalog
+            args (dict): Arguments of the forecast window
+            n_sims (int): Number of synthetic catalogs
+            seed (int, numpy.random.SeedSequence): The seed
+            engine (str): Simulation engine (see main.make_forecast)
+            first (int): Catalog id of the first synthetic catalog, for the
+                chunks of a forecast (see parallel.run_forecasts)
+        """
+        if isinstance(seed, numpy.random.SeedSequence):
+            seed = [seed.entropy, list(seed.spawn_key)]
+        params = {'args': {i: args.get(i) for i in MODEL_ARGS},
+                  'n_sims': n_sims, 'seed': seed, 'engine': engine,
+                  'first': first, 'version': pymock.__version__}
+        hasher = hashlib.sha1(json.dumps(params, sort_keys=True,
+                                         default=str).encode())
+        events = index.events_before(args['start_date'])
+        for col in Catalog.columns:
+            hasher.update(numpy.ascontiguousarray(getattr(events, col)))
+        return hasher.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder, f'{key}.npy')
+
+    def get(self, key):
+        """
+        Returns the cached forecast of a key as a (memory-mapped) Catalog, or
+        None if it is not cached
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+            return libs.load_forecast(path)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, forecast):
+        """
+        Stores a forecast (list or Catalog), and evicts the least recently
+        used forecasts if the cache exceeds its size
+        """
+        if self._size is None:
+            self._size = self.size()
+        path = self.path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+        try:
+            libs.save_forecast(tmp_path, forecast)
+            size = os.path.getsize(tmp_path)
+            if os.path.exists(path):
+                size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._size += size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def link(self, key, path, hardlink=False):
+        """
+        Places the cached forecast of a key at path (a .npy file), copying
+        the cached file. Returns False if it is not cached.
+
+        Args:
+            key (str): The key of the forecast
+            path (str): Destination path
+            hardlink (bool): Hard-links the cached file instead, if possible,
+                so no data is copied. The file at path then shares the cached
+                data, and must not be modified in place.
+        """
+        cached = self.path(key)
+        try:
+            os.utime(cached)
+            if os.path.lexists(path):
+                os.remove(path)
+            if hardlink:
+                try:
+                    os.link(cached, path)
+                    return True
+                except OSError:
+                    pass
+            shutil.copyfile(cached, path)
+        except OSError:
+            return False
+        return True
+
+    def size(self):
+        """
+        Total size of the cached forecasts, in bytes
+        """
+        return sum(i.stat().st_size for i in self._entries())
+
+    def evict(self):
+        """
+        Removes the least recently used forecasts until the cache fits in
+        max_bytes
+        """
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:  # removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(i[1] for i in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
+
+    def _entries(self):
+        with os.scandir(self.folder) as entries:
+            return [i for i in entries if i.name.endswith('.npy') and
+                    '.tmp' not in i.name]
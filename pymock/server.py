@@ -0,0 +1,218 @@
+"""
+Persistent forecasting server.
+
+Keeps the input catalogs loaded (and indexed) in memory, ingesting the rows
+appended to their files between requests, and serves forecast requests as
+json lines, either from stdin/stdout or from a local TCP socket.
+Each request is a json object with either an args file path or an args
+dictionary (see libs.read_args), e.g.:
+
+    {"id": 1, "args_path": "input/args.txt"}
+    {"id": 2, "args": {"start_date": "2018-07-02", "end_date": "2018-07-03",
+                       "catalog": "input/catalog.csv", "seed": 3},
+     "folder": "forecasts"}
+
+and it is answered with a json line, in order of completion:
+
+    {"id": 1, "status": "ok", "path": "forecasts/pymock_...csv",
+     "n_events": 24}
+    {"id": 2, "status": "error", "error": "..."}
+
+Run as:
+    $ pymock-server [--catalog <path>] [--workers <n>] [--port <port>]
+"""
+import argparse
+import contextlib
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from pymock import libs, main
+from pymock.catalog import CatalogIndex
+from pymock.region import Region
+from pymock.store import CatalogStore
+
+
+class ForecastServer:
+    """
+    Serves forecast requests with the input catalogs kept in memory.
+
+    Each catalog is kept in a CatalogStore, refreshed on every request, so
+    the rows appended to the catalog file (e.g. the events of the last day in
+    real-time operation) are parsed and added to the catalog in memory. The
+    requests are forecast and written as by main (see main.forecast_window),
+    including their region, chunk_size and result_cache arguments.
+
+    Args:
+        catalogs (list): (Optional) Catalog paths to load at start up. Other
+            catalogs are loaded the first time they are requested.
+        workers (int): Number of requests run concurrently (threads)
+        folder (str): Default output folder
+    """
+
+    def __init__(self, catalogs=(), workers=None, folder=None):
+        self.folder = folder or main.default_forecast_folder()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._stores = {}
+        self._regions = {}
+        self._lock = threading.Lock()
+        for path in catalogs:
+            self.get_index(path)
+
+    def get_index(self, path):
+        """
+        Returns the index of a catalog, loading it on its first request, and
+        otherwise ingesting the rows appended to its file since the last
+        request (see store.CatalogStore.refresh)
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            if key not in self._stores:
+                self._stores[key] = CatalogStore(path)
+            else:
+                self._stores[key].refresh()
+            return self._stores[key].index
+
+    def get_region(self, path, dh=0.1):
+        """
+        Returns a testing region, read from its file on its first request
+        """
+        key = (os.path.abspath(path), dh)
+        with self._lock:
+            if key not in self._regions:
+                self._regions[key] = Region.from_file(path, dh)
+            return self._regions[key]
+
+    def forecast(self, request):
+        """
+        Runs a forecast request (see module docstring) and returns its
+        response
+        """
+        if 'args_path' in request:
+            args = libs.read_args(request['args_path'])
+        else:
+            args = libs.parse_args(request['args'],
+                                   request.get('base_dir', ''))
+        args = {**args, **libs.parse_args(request.get('overrides', {}))}
+        folder = request.get('folder', self.folder)
+
+        index = self.get_index(args['catalog'])
+        region = None
+        if args.get('region'):
+            region = self.get_region(args['region'],
+                                     args.get('region_dh', 0.1))
+            if args.get('region_filter'):
+                index = CatalogIndex(region.filter(index.catalog))
+        return main.forecast_window(index, args, folder, region)
+
+    def submit(self, line, respond):
+        """
+        Runs a json line request in the pool, and passes its json response
+        to respond once it is done. Returns the Future of the request, or None
+        if the line could not be decoded.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            respond(json.dumps({'status': 'error', 'error': str(e)}))
+            return None
+
+        def task():
+            response = {'id': request.get('id')}
+            try:
+                response.update(status='ok', **self.forecast(request))
+            except Exception as e:  # reported back, the server keeps running
+                response.update(status='error',
+                                error=f'{type(e).__name__}: {e}')
+            respond(json.dumps(response))
+
+        return self.executor.submit(task)
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """
+        Serves requests read from stdin until its end, writing the responses
+        to stdout. By default, these are the standard input and output of the
+        process, and anything else printed while serving (e.g. the log of
+        main.make_forecast) is redirected to stderr, so the standard output
+        only carries the json responses.
+        """
+        if stdin is None:
+            stdin = sys.stdin
+        if stdout is not None:
+            self._serve_stdio(stdin, stdout)
+            return
+        sys.stdout.flush()
+        with os.fdopen(os.dup(sys.stdout.fileno()), 'w') as stdout, \
+                contextlib.redirect_stdout(sys.stderr):
+            self._serve_stdio(stdin, stdout)
+
+    def _serve_stdio(self, stdin, stdout):
+        lock = threading.Lock()
+
+        def respond(response):
+            with lock:
+                stdout.write(response + '\n')
+                stdout.flush()
+
+        for line in stdin:
+            if line.strip():
+                self.submit(line, respond)
+        self.executor.shutdown(wait=True)
+
+    def serve_tcp(self, host='127.0.0.1', port=0):
+        """
+        Serves requests from a local TCP socket, answering on the same
+        connection. Blocks until interrupted.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+
+                def respond(response):
+                    with lock:
+                        self.wfile.write((response + '\n').encode())
+                        self.wfile.flush()
+
+                futures = [server.submit(line, respond)
+                           for line in self.rfile if line.strip()]
+                wait([i for i in futures if i])  # answer all before closing
+
+        with socketserver.ThreadingTCPServer((host, port), Handler) as tcp:
+            print(f'pymock server listening on {tcp.server_address}',
+                  file=sys.stderr)
+            tcp.serve_forever()
+
+
+def run():
+    """
+    Command entry point of the server (see setup.cfg, entry_points)
+    """
+    parser = argparse.ArgumentParser(
+        prog='pymock-server',
+        description='Persistent pymock server, answering json line forecast '
+                    'requests from stdin or a local TCP socket.')
+    parser.add_argument('--catalog', action='append', default=[],
+                        help='Catalog to load at start up (repeatable)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of concurrent requests')
+    parser.add_argument('--folder', default=None,
+                        help='Default output folder')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Serve from a TCP socket instead of stdin')
+    options = parser.parse_args()
+
+    server = ForecastServer(options.catalog, options.workers, options.folder)
+    if options.port is None:
+        server.serve_stdio()
+    else:
+        server.serve_tcp(options.host, options.port)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,100 @@
+import os
+
+from pymock import libs
+from pymock.catalog import CatalogIndex
+
+
+class CatalogStore:
+    """
+    Append-aware in-memory catalog of a CSEP formatted catalog file, for
+    real-time operation where the catalog only grows by a few events at a
+    time.
+
+    The store keeps the CatalogIndex of the file, along with the size and
+    hash of the contents it was built from. On refresh, only the rows
+    appended to the file since are parsed, and added to the index (and to
+    the binary cache of the file, see libs.load_catalog). If the file was
+    otherwise modified, it is loaded again.
+
+    The index is never modified once it is built: a refresh extends a copy
+    of it, which then replaces it. Hence an index got from the store is a
+    consistent snapshot of the catalog, that other threads can keep reading
+    while the store is refreshed.
+
+    Args:
+        path (str): Path to the catalog file
+        cache (bool): Read/write the binary cache of the catalog
+        cache_dir (str): (Optional) Folder of the cache files
+    """
+
+    def __init__(self, path, cache=True, cache_dir=None):
+        self.path = path
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self._load()
+
+    @property
+    def catalog(self):
+        return self.index.catalog
+
+    def __len__(self):
+        return len(self.index)
+
+    def _load(self):
+        records, self._state = libs.load_records(self.path, self.cache,
+                                                 self.cache_dir)
+        self._key = libs.file_key(self.path)
+        self.index = CatalogIndex(libs.records_to_catalog(records))
+
+    def refresh(self):
+        """
+        Ingests the rows appended to the catalog file since it was last read.
+
+        Returns:
+            The number of new events, or None if the file was modified other
+            than by appending rows, and thus loaded again.
+        """
+        key = libs.file_key(self.path)
+        if key == self._key:
+            return 0
+
+        new = None
+        if key['size'] >= self._state['size']:
+            new = libs.read_new_events(self.path, **self._state)
+        if new is None:
+            self._load()
+            return None
+
+        records, state = new
+        if self.cache:
+            libs.append_catalog_cache(self.path, self._state, records, state,
+                                      self.cache_dir)
+        index = self.index.copy()
+        index.extend(libs.records_to_catalog(records))
+        self.index = index
+        self._state = state
+        self._key = key
+        return len(records)
+
+    def append(self, delta_path):
+        """
+        Appends the events of a delta catalog file (e.g. the events of the
+        last day, with the CSEP header) to the catalog file, and ingests them.
+
+        Returns:
+            The number of new events (see refresh)
+        """
+        with open(delta_path, 'rb') as f_:
+            rows = f_.read().partition(b'\n')[2]  # skips the header
+        if rows and not rows.endswith(b'\n'):
+            rows += b'\n'
+        with open(self.path, 'ab') as f_:
+            if f_.tell() and not self._ends_with_newline():
+                f_.write(b'\n')
+            f_.write(rows)
+        return self.refresh()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f_:
+            f_.seek(-1, os.SEEK_END)
+            return f_.read(1) == b'\n'
@@ -0,0 +1,169 @@
+"""
+Parameter sweeps: forecasts of several model variants over the same
+windows, e.g. to compare the variants of pymock created by mag_min,
+lookback_days, mag_compl, apply_mc_to_lambda and distribution.
+
+Run as:
+    $ pymock-sweep input/args.txt --grid mag_min=3.5,4.0 \
+        --grid distribution=poisson,negbinom --folder sweep
+"""
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from pymock import libs, main, parallel
+from pymock.catalog import CatalogIndex
+
+
+def sweep_variants(grid):
+    """
+    Returns the variants of a parameter grid, i.e. the combinations of its
+    values, as a list of dictionaries
+
+    Args:
+        grid (dict): Values of each swept parameter, e.g.
+            {'mag_min': [3.5, 4.0], 'distribution': ['poisson', 'negbinom']}
+    """
+    names = list(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[grid[i] for i in names])]
+
+
+def run_sweep(input_catalog, args, grid, windows=None, n_sims=None,
+              seed=None, folder='sweep', workers=1, engine='vectorized'):
+    """
+    Creates the forecasts of every variant of a parameter grid, for the same
+    time windows.
+
+    The input catalog is sorted and indexed once for all the variants, so the
+    catalog filters (per magnitude threshold) and past window counts that the
+    variants have in common are computed only once, and each variant only
+    costs its own sampling. Every window gets the same random stream in all
+    variants (see parallel.window_seed), so the variants are compared with
+    common random numbers.
+
+    The forecasts of each variant are written to their own sub-folder, and a
+    manifest.json file in folder lists the variants with their parameters
+    and forecast files.
+
+    Args:
+        input_catalog (list, Catalog, CatalogIndex): The input catalog (see
+            main.make_forecast)
+        args (dict): Arguments shared by all the variants. The catalog
+            cannot be swept.
+        grid (dict): Values of the swept parameters (see sweep_variants)
+        windows (list): (Optional) A sequence of (start_date, end_date)
+            windows. Defaults to the window of args.
+        n_sims (int): Number of stochastic catalogs per window. Defaults to
+            the args' n_sims, or 1000.
+        seed (int): Root seed. Defaults to the args' seed.
+        folder (str): Output folder
+        workers (int): Number of processes. With 1 worker (default), all the
+            variants run in the current process.
+        engine (str): Simulation engine (see main.make_forecast)
+
+    Returns:
+        The manifest, as a dictionary
+    """
+    main._check_engine(engine)
+    if windows is None:
+        windows = [(args['start_date'], args['end_date'])]
+    if n_sims is None:
+        n_sims = args.get('n_sims', 1000)
+    if seed is None:
+        seed = args.get('seed', None)
+
+    if not isinstance(input_catalog, CatalogIndex):
+        input_catalog = CatalogIndex(input_catalog)
+
+    variants = []
+    tasks = []
+    for n, params in enumerate(sweep_variants(grid)):
+        name = f'variant_{n:03d}'
+        variant_args = {**args, **params}
+        variant_folder = os.path.join(folder, name)
+        os.makedirs(variant_folder, exist_ok=True)
+        tasks.extend(parallel._make_tasks(variant_args, windows, n_sims, seed,
+                                          n_sims, variant_folder, engine))
+        variants.append({'name': name, 'params': params})
+
+    if workers == 1:
+        files = [parallel._forecast_task(input_catalog, task)
+                 for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=parallel._init_worker,
+                                 initargs=(input_catalog.catalog,)) as pool:
+            files = list(pool.map(parallel._worker_task, tasks))
+
+    for n, variant in enumerate(variants):
+        variant['files'] = [os.path.relpath(i, folder) for i in
+                            files[n * len(windows):(n + 1) * len(windows)]]
+
+    manifest = {'windows': [[start.isoformat(), end.isoformat()]
+                            for start, end in windows],
+                'n_sims': n_sims, 'seed': seed, 'engine': engine,
+                'variants': variants}
+    with open(os.path.join(folder, 'manifest.json'), 'w') as f_:
+        json.dump(manifest, f_, indent=2, default=str)
+    return manifest
+
+
+def _parse_grid(items, folder):
+    """
+    Parses --grid name=value1,value2 options into a parameter grid, with the
+    values typed as in an arguments file
+    """
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        grid[name.strip()] = [
+            libs.parse_args({name.strip(): i.strip()}, folder)[name.strip()]
+            for i in values.split(',')]
+    return grid
+
+
+def run():
+    """
+    Command entry point of the sweeps (see setup.cfg, entry_points)
+    """
+    parser = argparse.ArgumentParser(
+        prog='pymock-sweep',
+        description='Runs the forecasts of a grid of pymock variants.')
+    parser.add_argument('arg_path', help='Arguments file shared by all the '
+                                         'variants')
+    parser.add_argument('--grid', action='append', default=[],
+                        metavar='NAME=V1,V2,...',
+                        help='Values of a swept parameter (repeatable)')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help='Start date of the first window. Defaults to '
+                             'the window of the arguments file.')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None,
+                        help='End date of the last window')
+    parser.add_argument('--step', type=float, default=1,
+                        help='Window length in days (default 1)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes')
+    parser.add_argument('--folder', default='sweep', help='Output folder')
+    options = parser.parse_args()
+
+    args = libs.read_args(options.arg_path)
+    grid = _parse_grid(options.grid, os.path.dirname(options.arg_path))
+    windows = None
+    if options.start or options.end:
+        windows = libs.forecast_windows(options.start or args['start_date'],
+                                        options.end or args['end_date'],
+                                        options.step)
+
+    catalog = libs.load_catalog(args['catalog'])
+    manifest = run_sweep(catalog, args, grid, windows, folder=options.folder,
+                         workers=options.workers)
+    print(f"{len(manifest['variants'])} variants x "
+          f"{len(manifest['windows'])} windows written to {options.folder}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,125 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+import numpy
+
+from pymock import libs
+from pymock.catalog import (Catalog, CatalogIndex, datetime_to_epoch,
+                            epoch_to_datetime)
+
+current_dir = os.path.dirname(__file__)
+catalog_path = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestCatalog(unittest.TestCase):
+
+    def test_epoch(self):
+        time = datetime(2008, 6, 22, 23, 43, 42, 780000)
+        epoch = datetime_to_epoch(time)
+        assert epoch == 1214178222780000
+        assert epoch_to_datetime(epoch) == time
+        numpy.testing.assert_equal(datetime_to_epoch([time, time]),
+                                   [epoch, epoch])
+
+    def test_list_conversion(self):
+        events = libs.load_cat(catalog_path)
+        catalog = Catalog.from_list(events)
+
+        assert len(catalog) == 35499
+        assert catalog.time.dtype == numpy.int64
+        assert catalog.lon.dtype == numpy.float64
+        assert catalog.nbytes == 35499 * 7 * 8
+        assert catalog.to_list() == events
+        assert catalog[3211] == events[3211]
+
+    def test_filter_sort(self):
+        catalog = Catalog.from_list(libs.load_cat(catalog_path))
+        sub = catalog[catalog.mag >= 4.0]
+        assert len(sub) == len([i for i in catalog if i[2] >= 4.0])
+
+        shuffled = catalog[numpy.random.default_rng(2).permutation(
+            len(catalog))]
+        assert not shuffled.is_sorted()
+        sorted_ = shuffled.sort()
+        assert sorted_.is_sorted()
+        numpy.testing.assert_equal(sorted_.time, numpy.sort(catalog.time))
+
+        # Positions of the indexed events in the shuffled catalog
+        index = CatalogIndex(shuffled)
+        for mag_min in (None, 4.0):
+            assert (shuffled[index.positions(mag_min)].to_list() ==
+                    index.subset(mag_min).to_list())
+        t = datetime(2016, 11, 1)
+        assert (shuffled[index.positions_before(t, 4.0)].to_list() ==
+                index.events_before(t, 4.0).to_list())
+
+    def test_index_queries(self):
+        events = libs.load_cat(catalog_path)
+        index = CatalogIndex(Catalog.from_list(events)[::-1])
+        assert index.catalog.is_sorted()
+
+        t1 = datetime(2009, 4, 6)
+        t2 = datetime(2009, 4, 13)
+        before = [i for i in events if i[3] < t1 and i[2] >= 3.0]
+        between = [i for i in events if t1 <= i[3] < t2 and i[2] >= 3.0]
+
+        assert index.count_before(t1, 3.0) == len(before)
+        assert index.count_between(t1, t2, 3.0) == len(between)
+        assert index.events_between(t1, t2, 3.0).to_list() == between
+        assert index.count_between(t2, t1) == 0
+
+        # Queries are views of the index arrays
+        view = index.events_before(t1, 3.0)
+        assert len(view) == len(before)
+        assert numpy.shares_memory(view.time, index.subset(3.0).time)
+        assert index.subset(3) is index.subset(3.0)
+
+    def test_window_counts(self):
+        events = libs.load_cat(catalog_path)
+        index = CatalogIndex(events)
+        for mag_min in (2.0, 4.0):
+            times = [i[3] for i in events if i[2] >= mag_min]
+            for length in (timedelta(days=1), timedelta(seconds=86399),
+                           timedelta(days=7)):
+                for t in (datetime(2009, 4, 6, 1, 32, 39),
+                          datetime(2016, 11, 5, 3, 22, 31),
+                          datetime(2020, 1, 1)):
+                    past = [i for i in times if i < t]
+                    edges = numpy.arange(min(past).date(), max(past).date(),
+                                         length)
+                    expected, _ = numpy.histogram(past, edges)
+                    numpy.testing.assert_equal(
+                        index.window_counts(t, length, mag_min), expected)
+
+    def test_extend(self):
+        catalog = libs.load_catalog(catalog_path, cache=False)
+        full = CatalogIndex(catalog)
+        index = CatalogIndex(catalog[:-300])
+        t = datetime(2020, 1, 1)
+        for mag_min in (None, 3.0):
+            index.window_counts(t, timedelta(days=1), mag_min)
+        for i in range(-300, 0, 100):  # appended in chunks
+            index.extend(catalog[i:i + 100 or None])
+        assert index.catalog.to_list() == full.catalog.to_list()
+        for mag_min in (None, 3.0, 4.0):
+            assert (index.subset(mag_min).to_list() ==
+                    full.subset(mag_min).to_list())
+            numpy.testing.assert_equal(index.positions(mag_min),
+                                       full.positions(mag_min))
+            numpy.testing.assert_equal(
+                index.window_counts(t, timedelta(days=1), mag_min),
+                full.window_counts(t, timedelta(days=1), mag_min))
+
+        # Earlier events are merged
+        index = CatalogIndex(catalog[100:])
+        index.extend(catalog[:100])
+        assert index.catalog.to_list() == full.catalog.to_list()
+        positions = numpy.concatenate([numpy.arange(100, len(catalog)),
+                                       numpy.arange(100)])
+        assert (catalog[positions][index.positions()].to_list() ==
+                index.catalog.to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
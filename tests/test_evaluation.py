@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy
+
+from pymock import evaluation, libs, main
+from pymock.catalog import CatalogIndex
+from pymock.parallel import run_forecasts
+
+cat_file = os.path.join(os.path.dirname(__file__), 'artifacts', 'iside_tests')
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = libs.load_catalog(cat_file, cache=False)
+        self.args = {'mag_min': 3.5, 'seed': 5}
+        self.windows = libs.forecast_windows(datetime(2009, 4, 3),
+                                             datetime(2009, 4, 9))
+
+    def test_observed_counts(self):
+        index = CatalogIndex(self.catalog)
+        for mag_min in (None, 3.5):
+            counts = evaluation.observed_counts(self.catalog, self.windows,
+                                                mag_min)
+            expected = [index.count_between(*i, mag_min)
+                        for i in self.windows]
+            numpy.testing.assert_equal(counts, expected)
+        assert evaluation.observed_counts(index, [], 3.5).size == 0
+
+    def test_evaluate(self):
+        n_sims = 50
+        forecasts = run_forecasts(self.catalog, self.args, self.windows,
+                                  n_sims=n_sims, workers=1)
+        with tempfile.TemporaryDirectory() as folder:
+            paths = run_forecasts(self.catalog, self.args, self.windows,
+                                  n_sims=n_sims, workers=1, folder=folder)
+            from_files = evaluation.evaluate(paths, self.catalog,
+                                             self.windows, n_sims)
+
+        results = evaluation.evaluate(forecasts, self.catalog, self.windows,
+                                      n_sims, mag_min=3.5)
+        for forecast, counts in zip(forecasts, results['counts']):
+            expected = [sum(1 for i in forecast if i[5] == n)
+                        for n in range(n_sims)]
+            numpy.testing.assert_equal(counts, expected)
+        numpy.testing.assert_equal(from_files['counts'], results['counts'])
+        numpy.testing.assert_allclose(
+            results['mean'], [len(i) / n_sims for i in forecasts])
+        assert results['quantiles'].shape == (3, len(self.windows))
+        assert numpy.all(results['quantiles'][0] <= results['quantiles'][2])
+
+        observed = results['observed']
+        for n, counts in enumerate(results['counts']):
+            assert results['delta_1'][n] == numpy.mean(counts >= observed[n])
+            assert results['delta_2'][n] == numpy.mean(counts <= observed[n])
+
+        # Counts of the rates-only mode
+        counts = main.make_window_rates(self.catalog, self.args,
+                                        self.windows, n_sims, seed=1)
+        rates = evaluation.evaluate(counts, self.catalog, self.windows,
+                                    n_sims, mag_min=3.5)
+        numpy.testing.assert_equal(rates['observed'], observed)
+        numpy.testing.assert_allclose(rates['mean'], counts.mean(axis=1))
+
+        with self.assertRaises(ValueError):
+            evaluation.evaluate(forecasts[1:], self.catalog, self.windows,
+                                n_sims)
+
+
+if __name__ == '__main__':
+    unittest.main()
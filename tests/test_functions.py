@@ -1,8 +1,10 @@
 import os
+import tempfile
 import unittest
 import numpy
-from datetime import datetime
+from datetime import datetime, timedelta
 from pymock import main, libs
+from pymock.catalog import datetime_to_epoch
 arg_file = os.path.join(os.path.dirname(__file__), 'artifacts',
                         'args_test.txt')
 cat_file = os.path.join(os.path.dirname(__file__), 'artifacts', 'iside_tests')
@@ -15,12 +17,20 @@ class TestMain(unittest.TestCase):
         assert args['start_date'] == datetime(2016, 11, 5, 3, 22, 31)
         assert args['end_date'] == datetime(2016, 11, 6, 3, 22, 30)
 
+    def test_default_args(self):
+        # apply_mc_to_lambda keeps the baseline bool() parsing, so the shipped
+        # model is unchanged
+        args = libs.read_args(os.path.join(os.path.dirname(__file__), '..',
+                                           'input', 'args.txt'))
+        assert args['apply_mc_to_lambda'] is True
+
     def test_make_forecast(self):
         catalog = libs.load_cat(cat_file)
         params = libs.read_args(arg_file)
         n_sims = 100
         seed = 24
-        forecast = main.make_forecast(catalog, params, n_sims, seed)
+        forecast = main.make_forecast(catalog, params, n_sims, seed,
+                                      engine='legacy')
         # Check total number of events
         assert len(forecast) == 10
 
@@ -32,8 +42,160 @@ class TestMain(unittest.TestCase):
         numpy.testing.assert_almost_equal(forecast[9][5], 97)
         numpy.testing.assert_almost_equal(forecast[9][6], 1)
 
+    def test_legacy_unsorted_catalog(self):
+        # The test catalog is not strictly sorted by time, and the legacy
+        # engine samples events by their position in the file
+        catalog = libs.load_cat(cat_file)
+        params = {'start_date': datetime(2016, 10, 30),
+                  'end_date': datetime(2016, 10, 31), 'mag_min': 3.5,
+                  'apply_mc_to_lambda': True}
+        forecast = main.make_forecast(catalog, params, 50, seed=7,
+                                      verbose=False, engine='legacy')
+        assert len(forecast) == 157
+        numpy.testing.assert_almost_equal(forecast[116][:2], [14.423, 38.428])
+        numpy.testing.assert_almost_equal(forecast[116][4], 7.1)
+
+    def test_round_div(self):
+        # Event times in microseconds are rounded as t0 + x * dt would be
+        t0 = datetime(2016, 11, 5, 3, 22, 31)
+        t0_us = datetime_to_epoch(t0)
+        rng = numpy.random.default_rng(4)
+        for dt in (timedelta(days=1, seconds=-1), timedelta(microseconds=7),
+                   timedelta(days=3, microseconds=1), timedelta(days=1)):
+            dt_us = dt // timedelta(microseconds=1)
+            for x in rng.random(2000).tolist() + [0.5, 0.25, 0.75]:
+                u, v = x.as_integer_ratio()
+                assert t0_us + main._round_div(dt_us * u, v) == \
+                    datetime_to_epoch(t0 + x * dt)
+
+    def test_make_forecast_vectorized(self):
+        catalog = libs.load_cat(cat_file)
+        params = libs.read_args(arg_file)
+        n_sims = 20000
+        forecast = main.make_forecast(catalog, params, n_sims, seed=24,
+                                      verbose=False)
+        # Same output for the same seed
+        assert forecast == main.make_forecast(catalog, params, n_sims,
+                                              seed=24, verbose=False)
+        # Mean rate close to the model's (mu + lambda)
+        t0, end = params['start_date'], params['end_date']
+        cat_total = [i for i in catalog if i[3] < t0 and i[2] >= 2.0]
+        mu = len(cat_total) * (end - t0) / (t0 - cat_total[0][3]) / 100
+        lambd = len([i for i in cat_total if i[3] >= t0 - (end - t0) and
+                     i[2] >= 4.0])
+        numpy.testing.assert_allclose(len(forecast) / n_sims, mu + lambd,
+                                      rtol=0.15)
+
+        # Events ids are consecutive within each synthetic catalog
+        cat_ids = numpy.array([i[5] for i in forecast])
+        event_ids = numpy.array([i[6] for i in forecast])
+        assert numpy.all(numpy.diff(cat_ids) >= 0)
+        for n_cat in numpy.unique(cat_ids)[:10]:
+            ids = event_ids[cat_ids == n_cat]
+            numpy.testing.assert_equal(ids, numpy.arange(ids.size))
+
+        # Magnitudes and times within their bounds
+        mags = numpy.array([i[2] for i in forecast])
+        assert mags.min() >= params.get('mag_min', 4.0) - 1e-9
+        assert mags.max() < 8.0 + 1e-9
+        assert all(params['start_date'] <= i[3] <= params['end_date']
+                   for i in forecast)
+
+    def test_make_forecasts(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = {'mag_min': 3.5, 'distribution': 'negbinom'}
+        windows = libs.forecast_windows(datetime(2009, 4, 1),
+                                        datetime(2009, 4, 11))
+        assert len(windows) == 10
+        assert windows[-1] == (datetime(2009, 4, 10), datetime(2009, 4, 11))
+
+        forecasts = main.make_forecasts(catalog, params, windows, n_sims=50,
+                                        seed=11)
+
+        # Same as sequential calls drawing from the same random stream
+        rng = numpy.random.default_rng(11)
+        for (start, end), forecast in zip(windows, forecasts):
+            args = {**params, 'start_date': start, 'end_date': end}
+            assert forecast == main.make_forecast(catalog, args, n_sims=50,
+                                                  verbose=False, rng=rng)
+
+        with tempfile.TemporaryDirectory() as folder:
+            paths = main.make_forecasts(catalog, params, windows, n_sims=50,
+                                        seed=11, folder=folder)
+            assert paths == [libs.syncat_path(*i, folder) for i in windows]
+            assert all(os.path.isfile(i) for i in paths)
+
+    def test_global_random_state(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = libs.read_args(arg_file)
+        state = numpy.random.get_state()[1].copy()
+        for engine in ('vectorized', 'legacy'):
+            main.make_forecast(catalog, params, 100, seed=3, verbose=False,
+                               engine=engine)
+            main.make_forecast(catalog, params, 100, verbose=False,
+                               engine=engine)
+        numpy.testing.assert_equal(numpy.random.get_state()[1], state)
+
+        # A given generator is used instead of the seed
+        rng = numpy.random.Generator(numpy.random.PCG64(3))
+        assert main.make_forecast(catalog, params, 1000, seed=4, rng=rng,
+                                  verbose=False) == \
+            main.make_forecast(catalog, params, 1000, seed=3, verbose=False)
+
+    def test_iter_forecast(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = {'start_date': datetime(2009, 4, 6),
+                  'end_date': datetime(2009, 4, 7), 'mag_min': 3.0}
+
+        chunks = main.iter_forecast(catalog, params, n_sims=250, seed=9,
+                                    chunk_size=100)
+        chunks = list(chunks)
+        assert len(chunks) == 3
+        assert chunks[2].catalog_id.min() >= 200
+        assert chunks[2].catalog_id.max() < 250
+
+        # Legacy chunks are identical to the non-streamed forecast
+        chunks = main.iter_forecast(catalog, params, n_sims=250, seed=9,
+                                    chunk_size=100, engine='legacy',
+                                    as_catalog=False)
+        legacy = main.make_forecast(catalog, params, n_sims=250, seed=9,
+                                    engine='legacy', verbose=False)
+        assert [i for chunk in chunks for i in chunk] == legacy
+
+    def test_make_rates(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = libs.read_args(arg_file)
+        n_sims = 500
+
+        # Counts of the synthetic catalogs of the vectorized engine
+        forecast = main.make_forecast(catalog, params, n_sims, seed=4,
+                                      verbose=False, as_catalog=True)
+        counts = main.make_rates(catalog, params, n_sims, seed=4)
+        numpy.testing.assert_equal(
+            counts, numpy.bincount(forecast.catalog_id, minlength=n_sims))
+
+        counts, hist = main.make_rates(catalog, params, n_sims, seed=4,
+                                       mag_hist=True)
+        assert hist.shape == (n_sims, 40)  # bins of 0.1 from 4.0 to 8.0
+        numpy.testing.assert_equal(hist.sum(axis=1), counts)
+
+        windows = libs.forecast_windows(datetime(2016, 11, 1),
+                                        datetime(2016, 11, 11))
+        rates = main.make_window_rates(catalog, params, windows, n_sims,
+                                       seed=4)
+        assert rates.shape == (10, n_sims)
+        rng = numpy.random.default_rng(4)
+        for (start, end), counts in zip(windows, rates):
+            window = {**params, 'start_date': start, 'end_date': end}
+            numpy.testing.assert_equal(
+                main.make_rates(catalog, window, n_sims, rng=rng), counts)
 
 if __name__ == '__main__':
     testobj = TestMain()
     testobj.test_params_reader()
     testobj.test_make_forecast()
+    testobj.test_make_forecast_vectorized()
+    testobj.test_make_forecasts()
+    testobj.test_global_random_state()
+    testobj.test_iter_forecast()
+    testobj.test_make_rates()
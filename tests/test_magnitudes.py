@@ -0,0 +1,68 @@
+import os
+import unittest
+
+import numpy
+
+from pymock import libs, main
+from pymock.magnitudes import GRSampler, gr_sampler
+
+current_dir = os.path.dirname(__file__)
+arg_file = os.path.join(current_dir, 'artifacts', 'args_test.txt')
+cat_file = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestMagnitudes(unittest.TestCase):
+
+    def test_table(self):
+        sampler = gr_sampler(3.5)
+        assert gr_sampler(3.5) is sampler
+        numpy.testing.assert_equal(sampler.bins, numpy.arange(3.5, 8.1, 0.1))
+        prob = 10 ** (-sampler.bins[:-1]) - 10 ** (-sampler.bins[1:])
+        numpy.testing.assert_allclose(sampler.prob, prob / prob.sum())
+        assert not sampler.prob.flags.writeable
+
+        sampler = GRSampler(4.0, b=1.2, mag_max=7.0, bin_width=0.5)
+        numpy.testing.assert_allclose(sampler.bins, [4., 4.5, 5., 5.5, 6.,
+                                                     6.5, 7.])
+
+        # mag_max is the upper edge of the last bin, for any bin width
+        for bin_width in (0.05, 0.1, 0.25):
+            sampler = GRSampler(3.5, b=0.9, mag_max=6.0, bin_width=bin_width)
+            assert sampler.bins.size == round(2.5 / bin_width) + 1
+            numpy.testing.assert_allclose(sampler.bins[-1], 6.0)
+
+    def test_sample(self):
+        rng = numpy.random.default_rng(0)
+        for b in (0.8, 1.0, 1.5):
+            sampler = GRSampler(3.0, b=b)
+            mags = sampler.sample(rng, 200000)
+            assert numpy.isin(mags, sampler.bins[:-1]).all()
+            freq = numpy.bincount(numpy.searchsorted(sampler.bins, mags,
+                                                     side='right') - 1,
+                                  minlength=sampler.prob.size)
+            numpy.testing.assert_allclose(freq[:5] / mags.size,
+                                          sampler.prob[:5], rtol=0.05)
+
+            continuous = GRSampler(3.0, b=b, continuous=True)
+            mags = continuous.sample(rng, 200000)
+            assert mags.min() >= 3.0 and mags.max() <= 8.0
+            # Mean of the exponential distribution (truncation negligible)
+            numpy.testing.assert_allclose(mags.mean() - 3.0,
+                                          1 / (b * numpy.log(10)), rtol=0.02)
+        assert isinstance(GRSampler(3.0).sample(rng), float)
+
+    def test_forecast_args(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = libs.read_args(arg_file)
+        params.update(b_value=0.8, mag_max=6.0, continuous_mags=True)
+        for engine in ('vectorized', 'legacy'):
+            forecast = main.make_forecast(catalog, params, 200, seed=1,
+                                          verbose=False, engine=engine,
+                                          as_catalog=True)
+            assert len(forecast) > 0
+            assert forecast.mag.min() >= 4.0 and forecast.mag.max() <= 6.0
+            assert not numpy.isin(forecast.mag, gr_sampler(4.0).bins).all()
+
+
+if __name__ == '__main__':
+    unittest.main()
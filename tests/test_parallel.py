@@ -0,0 +1,130 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy
+
+from pymock import libs, main
+from pymock.parallel import run_forecasts
+from pymock.region import Region, grid_path
+
+cat_file = os.path.join(os.path.dirname(__file__), 'artifacts', 'iside_tests')
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = libs.load_catalog(cat_file, cache=False)
+        self.args = {'mag_min': 3.5, 'seed': 5, 'n_sims': 40}
+        self.windows = libs.forecast_windows(datetime(2009, 4, 3),
+                                             datetime(2009, 4, 9))
+
+    def test_workers_reproducibility(self):
+        serial = run_forecasts(self.catalog, self.args, self.windows,
+                               workers=1)
+        parallel = run_forecasts(self.catalog, self.args, self.windows,
+                                 workers=3)
+        assert len(serial) == len(self.windows)
+        assert serial == parallel
+        assert any(serial)
+
+        # A window's forecast does not depend on the other windows
+        assert run_forecasts(self.catalog, self.args, self.windows[2:],
+                             workers=1) == serial[2:]
+        assert run_forecasts(self.catalog, {**self.args, 'seed': 6},
+                             self.windows, workers=1) != serial
+
+    def test_chunks(self):
+        serial = run_forecasts(self.catalog, self.args, self.windows,
+                               workers=1, chunk_size=15, as_catalog=True)
+        parallel = run_forecasts(self.catalog, self.args, self.windows,
+                                 workers=2, chunk_size=15, as_catalog=True)
+        for a, b in zip(serial, parallel):
+            assert a.to_list() == b.to_list()
+        assert max(i.catalog_id.max() for i in serial if len(i)) >= 15
+
+        # No chunking is the same as a single chunk per window
+        single = run_forecasts(self.catalog, self.args, self.windows,
+                               workers=1, chunk_size=40)
+        assert single == run_forecasts(self.catalog, self.args, self.windows,
+                                       workers=1)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = run_forecasts(self.catalog, self.args, self.windows,
+                                  workers=2, folder=folder)
+            assert paths == [libs.syncat_path(*i, folder)
+                             for i in self.windows]
+            assert all(os.path.isfile(i) for i in paths)
+
+    def test_main_windows(self):
+        with tempfile.TemporaryDirectory() as folder:
+            # A copy of the catalog, so its cache is written in folder
+            shutil.copy(cat_file, os.path.join(folder, 'catalog.csv'))
+            args_path = os.path.join(folder, 'args.txt')
+            with open(args_path, 'w') as f_:
+                f_.write(f'start_date = 2009-04-03\n'
+                         f'end_date = 2009-04-04\n'
+                         f'catalog = catalog.csv\n'
+                         f'mag_min = 3.5\n'
+                         f'n_sims = 40\n'
+                         f'seed = 1\n')
+            paths = main.main_windows(args_path, folder,
+                                      end=datetime(2009, 4, 9), seed=5,
+                                      workers=2)
+            assert paths == [libs.syncat_path(*i, folder)
+                             for i in self.windows]
+            forecasts = run_forecasts(self.catalog, self.args, self.windows,
+                                      workers=1)
+            for path, forecast in zip(paths, forecasts):
+                assert len(libs.load_forecast(path)) == len(forecast)
+
+    def test_main_windows_region(self):
+        # Gridded rates are written for every window, as by main
+        with tempfile.TemporaryDirectory() as folder:
+            shutil.copy(cat_file, os.path.join(folder, 'catalog.csv'))
+            with open(os.path.join(folder, 'region'), 'w') as f_:
+                f_.write('12 41\n14 41\n14 43\n12 43\n')
+            args_path = os.path.join(folder, 'args.txt')
+            for chunk_size in (None, 15):
+                with open(args_path, 'w') as f_:
+                    f_.write(f'start_date = 2009-04-03\n'
+                             f'end_date = 2009-04-04\n'
+                             f'catalog = catalog.csv\n'
+                             f'mag_min = 3.5\n'
+                             f'n_sims = 40\n'
+                             f'region = region\n'
+                             f'region_dh = 0.5\n')
+                    if chunk_size:
+                        f_.write(f'chunk_size = {chunk_size}\n')
+                paths = main.main_windows(args_path, folder,
+                                          end=datetime(2009, 4, 6), seed=5)
+                region = Region.from_file(os.path.join(folder, 'region'),
+                                          0.5)
+                for (start, end), path in zip(self.windows, paths):
+                    forecast = libs.load_forecast(path)
+                    rates = numpy.loadtxt(grid_path(start, end, folder))
+                    assert len(rates) == len(region) * 45
+                    cells = region.cell_index(forecast.lon, forecast.lat)
+                    assert round(rates[:, 8].sum() * 40) == \
+                        (cells >= 0).sum()
+
+    def test_run_options(self):
+        # Options of the date range are rejected for a single window
+        for argv in (['--workers', '2'], ['--seed', '1'],
+                     ['--start', '2009-04-03', '--profile']):
+            with mock.patch.object(sys, 'argv', ['pymock'] + argv), \
+                    mock.patch.object(main, 'main') as main_, \
+                    mock.patch.object(main, 'main_windows') as windows, \
+                    self.assertRaises(SystemExit):
+                main.run()
+            main_.assert_not_called()
+            windows.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymock import main
+from pymock.profiling import Profiler
+
+current_dir = os.path.dirname(__file__)
+cat_file = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copy(cat_file, os.path.join(self.tmp.name, 'catalog.csv'))
+        self.folder = os.path.join(self.tmp.name, 'forecasts')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_args(self, **extra):
+        path = os.path.join(self.tmp.name, 'args.txt')
+        with open(path, 'w') as f_:
+            f_.write('start_date = 2016-11-05T03:22:31\n'
+                     'end_date = 2016-11-06T03:22:30\n'
+                     'catalog = catalog.csv\n'
+                     'n_sims = 200\n'
+                     'seed = 3\n')
+            for key, value in extra.items():
+                f_.write(f'{key} = {value}\n')
+        return path
+
+    def test_stages(self):
+        received = []
+        records = main.main(self.write_args(), self.folder,
+                            hooks=[received.append])
+        assert [i['stage'] for i in records] == ['read_args', 'load_catalog',
+                                                 'forecast', 'write']
+        assert received == records
+        assert records[1]['n_events'] > 0
+        assert records[2]['n_sims'] == 200
+        assert records[2]['mu'] > 0 and records[2]['lambd'] >= 0
+        forecast = main.libs.load_forecast(os.path.join(
+            self.folder, 'pymock_2016-11-05_2016-11-06.csv'))
+        assert records[2]['n_events'] == len(forecast)
+        assert records[3]['bytes'] == os.path.getsize(os.path.join(
+            self.folder, 'pymock_2016-11-05_2016-11-06.csv'))
+        assert all(i['seconds'] >= 0 for i in records)
+        assert 'peak_memory' not in records[0]
+
+    def test_streamed(self):
+        records = main.main(self.write_args(chunk_size=50), self.folder,
+                            profile=True)
+        assert [i['stage'] for i in records] == ['read_args', 'load_catalog',
+                                                 'model', 'forecast', 'write']
+        assert records[2]['mu'] > 0
+        assert records[3]['n_chunks'] == 4
+        assert all(i['seconds'] >= 0 for i in records)
+        assert all(i['peak_memory'] >= 0 for i in records
+                   if i['stage'] != 'forecast')
+
+        with open(os.path.join(self.folder,
+                               'pymock_2016-11-05_2016-11-06_profile.json')) \
+                as f_:
+            assert json.load(f_) == json.loads(json.dumps(records))
+
+    def test_iterate(self):
+        profiler = Profiler()
+        with profiler.stage('outer') as record:
+            assert list(profiler.iterate('inner', [[1, 2], [3]])) == \
+                [[1, 2], [3]]
+            profiler.annotate(size=3)
+        assert [i['stage'] for i in profiler.records] == ['inner', 'outer']
+        assert profiler.records[0]['n_chunks'] == 2
+        assert profiler.records[0]['n_events'] == 3
+        assert record['size'] == 3
+        assert '_stream_seconds' not in record
+        assert 'outer' in profiler.summary()
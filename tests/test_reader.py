@@ -1,5 +1,7 @@
 import numpy
 import os
+import shutil
+import tempfile
 import unittest
 from pymock import libs
 from datetime import datetime
@@ -31,6 +33,41 @@ class TestMain(unittest.TestCase):
         assert catalog[3211][5] == -1
         assert catalog[3211][6] == 1827439
 
+    def test_load_catalog(self):
+        catalog = libs.load_catalog(catalog_path, cache=False)
+        assert catalog.to_list() == libs.load_cat(catalog_path)
+
+    def test_catalog_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'catalog.csv')
+            shutil.copy(catalog_path, path)
+            bin_path, meta_path = libs._catalog_cache_paths(path)
+
+            catalog = libs.load_catalog(path)
+            assert os.path.isfile(bin_path) and os.path.isfile(meta_path)
+            assert not isinstance(catalog.time.base, numpy.memmap)
+
+            # Second read is memory-mapped from the cache
+            cached = libs.load_catalog(path)
+            assert isinstance(cached.time.base, numpy.memmap)
+            assert cached.to_list() == catalog.to_list()
+
+            # Modified catalog invalidates the cache
+            with open(path) as f_:
+                lines = f_.readlines()
+            with open(path, 'w') as f_:
+                f_.writelines(lines[:101])
+            assert len(libs.load_catalog(path)) == 100
+            assert len(libs.load_catalog(path)) == 100
+
+            # Appended rows are parsed and added to the cache
+            with open(path, 'a') as f_:
+                f_.writelines(lines[101:201])
+            appended = libs.load_catalog(path)
+            assert isinstance(appended.time.base, numpy.memmap)
+            assert appended.to_list() == catalog.to_list()[:200]
+            assert libs.load_catalog(path).to_list() == appended.to_list()
+
 
 if __name__ == '__main__':
     TestMain().test_catread()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from pymock import libs, main
+from pymock.catalog import Catalog
+from pymock.magnitudes import gr_sampler
+from pymock.region import (Region, grid_counts, points_in_polygon,
+                           write_gridded_rates)
+
+current_dir = os.path.dirname(__file__)
+arg_file = os.path.join(current_dir, 'artifacts', 'args_test.txt')
+cat_file = os.path.join(current_dir, 'artifacts', 'iside_tests')
+region_file = os.path.join(current_dir, '..', 'examples', 'case_1', 'input',
+                           'region')
+
+
+class TestRegion(unittest.TestCase):
+
+    def test_points_in_polygon(self):
+        # L-shaped polygon
+        polygon = [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]]
+        lon = numpy.array([0.5, 1.5, 1.5, 0.5, 3.0, -0.5])
+        lat = numpy.array([0.5, 0.5, 1.5, 1.5, 0.5, 0.5])
+        numpy.testing.assert_equal(points_in_polygon(lon, lat, polygon),
+                                   [True, True, False, True, False, False])
+
+    def test_grid(self):
+        region = Region([[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]],
+                        dh=0.5)
+        assert region.shape == (4, 4)
+        assert len(region) == 12
+        numpy.testing.assert_equal(region.origins[:3],
+                                   [[0, 0], [0, 0.5], [0, 1.]])
+        numpy.testing.assert_equal(
+            region.cell_index([0.1, 0.1, 1.6, 1.6, 5.], [0.1, 0.6, 1.6, 0.1,
+                                                         0.1]),
+            [0, 1, -1, 10, -1])
+
+        catalog = Catalog([0.1, 0.2, 1.6, 1.6, 1.9], [0.1, 0.1, 0.1, 1.6, 0.1],
+                          [4.0, 4.55, 5.0, 4.0, 9.0], numpy.zeros(5),
+                          numpy.zeros(5))
+        counts = grid_counts(catalog, region)
+        assert counts.sum() == 4 and counts[0] == 2 and counts[10] == 2
+        counts = grid_counts(catalog, region, numpy.array([4., 4.5, 5.]))
+        assert counts.shape == (12, 2)
+        numpy.testing.assert_equal(counts[0], [1, 1])
+        numpy.testing.assert_equal(counts[10], [0, 2])
+
+    def test_cell_edges(self):
+        # Points on cell edges belong to the cell they start, although e.g.
+        # 12.3 / 0.1 < 123 in floating point
+        region = Region([[12, 42], [13, 42], [13, 43], [12, 43]], dh=0.1)
+        assert region.shape == (10, 10)
+        edges = 12 + numpy.arange(10) / 10
+        index = region.cell_index([12.3, 12.7, 12.9, 12.0], [42.3, 42.0,
+                                                             42.7, 42.9])
+        origins = region.origins[index]
+        numpy.testing.assert_allclose(origins, [[12.3, 42.3], [12.7, 42.0],
+                                                [12.9, 42.7], [12.0, 42.9]])
+        ix = region.cell_index(numpy.round(edges, 1), numpy.full(10, 42.5))
+        numpy.testing.assert_allclose(region.origins[ix, 0], edges)
+
+    def test_gridded_forecast(self):
+        region = Region.from_file(region_file)
+        catalog = libs.load_catalog(cat_file, cache=False)
+        params = libs.read_args(arg_file)
+        n_sims = 200
+
+        forecast = main.make_forecast(catalog, params, n_sims, seed=2,
+                                      verbose=False, as_catalog=True)
+        rates = main.make_forecast(catalog, params, n_sims, seed=2,
+                                   verbose=False, region=region)
+        assert rates.shape == (len(region), 40)
+        # Events within the cells whose centers are in the region
+        cells = region.cell_index(forecast.lon, forecast.lat)
+        assert round(rates.sum() * n_sims) == (cells >= 0).sum()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'grid.dat')
+            mag_bins = gr_sampler(4.0).bins
+            write_gridded_rates(path, region, rates, mag_bins)
+            table = numpy.loadtxt(path)
+            assert table.shape == (len(region) * 40, 10)
+            numpy.testing.assert_allclose(table[:, 8], rates.ravel(),
+                                          rtol=1e-5)
+            numpy.testing.assert_allclose(table[:40, 6], mag_bins[:-1])
+
+            # Only the rows of non-zero rate
+            write_gridded_rates(path, region, rates, mag_bins, sparse=True)
+            sparse = numpy.loadtxt(path, ndmin=2)
+            assert len(sparse) == numpy.count_nonzero(rates)
+            numpy.testing.assert_equal(sparse, table[table[:, 8] != 0])
+
+    def test_contains(self):
+        region = Region.from_file(region_file)
+        rng = numpy.random.default_rng(0)
+        lon = rng.uniform(4, 20, 100000)
+        lat = rng.uniform(35, 49, 100000)
+        expected = points_in_polygon(lon, lat, region.polygon)
+        assert 0 < expected.sum() < expected.size
+        for dh in (0.05, 0.1, 1.0):
+            numpy.testing.assert_equal(
+                Region(region.polygon, dh).contains(lon, lat), expected)
+
+    def test_filter(self):
+        region = Region.from_file(region_file)
+        catalog = libs.load_catalog(cat_file, cache=False)
+        inside = points_in_polygon(catalog.lon, catalog.lat, region.polygon)
+        filtered = libs.load_catalog(cat_file, cache=False, region=region)
+        assert filtered.to_list() == catalog[inside].to_list()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'forecast.csv')
+            libs.save_forecast(path, catalog.to_list(), region=region)
+            assert libs.load_cat(path) == catalog[inside].to_list()
+
+
+if __name__ == '__main__':
+    unittest.main()
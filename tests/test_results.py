@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy
+
+from pymock import libs, main, parallel
+from pymock.catalog import CatalogIndex
+from pymock.results import ResultCache
+
+cat_file = os.path.join(os.path.dirname(__file__), 'artifacts', 'iside_tests')
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = CatalogIndex(libs.load_catalog(cat_file, cache=False))
+        self.args = {'start_date': datetime(2009, 4, 6),
+                     'end_date': datetime(2009, 4, 7), 'mag_min': 3.5}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key(self):
+        cache = ResultCache(self.tmp.name)
+        key = cache.key(self.index, self.args, 100, 1)
+        assert key == cache.key(self.index, {**self.args, 'n_sims': 5}, 100,
+                                1)
+        assert key != cache.key(self.index, self.args, 100, 2)
+        assert key != cache.key(self.index, self.args, 50, 1)
+        assert key != cache.key(self.index, {**self.args, 'mag_min': 4.},
+                                100, 1)
+        assert key != cache.key(self.index, self.args, 100, 1, 'legacy')
+
+        # Only the events before the start date are hashed
+        later = CatalogIndex(self.index.catalog[
+            self.index.catalog.time < self.index.catalog.time[-1]])
+        assert key == cache.key(later, self.args, 100, 1)
+        earlier = self.index.events_before(self.args['start_date'])
+        assert key != cache.key(CatalogIndex(earlier[1:]), self.args, 100,
+                                1)
+
+    def test_make_forecast(self):
+        cache = ResultCache(self.tmp.name)
+        forecast = main.make_forecast(self.index, self.args, 100, seed=1,
+                                      verbose=False, cache=cache)
+        assert len(os.listdir(self.tmp.name)) == 1
+        with mock.patch.object(main, '_simulate') as simulate:
+            cached = main.make_forecast(self.index, self.args, 100, seed=1,
+                                        verbose=False, cache=cache)
+            simulate.assert_not_called()
+        assert cached == forecast
+        assert main.make_forecast(self.index, self.args, 100, seed=1,
+                                  verbose=False) == forecast
+
+        # No seed, nothing cached
+        main.make_forecast(self.index, self.args, 100, verbose=False,
+                           cache=cache)
+        assert len(os.listdir(self.tmp.name)) == 1
+
+    def test_run_forecasts(self):
+        cache = ResultCache(os.path.join(self.tmp.name, 'cache'))
+        windows = libs.forecast_windows(datetime(2009, 4, 3),
+                                        datetime(2009, 4, 9))
+        args = {'mag_min': 3.5, 'seed': 5, 'n_sims': 40}
+        expected = parallel.run_forecasts(self.index, args, windows,
+                                          workers=1, chunk_size=15)
+        # Resumed run: only the missing windows are simulated
+        parallel.run_forecasts(self.index, args, windows[:3], workers=1,
+                               chunk_size=15, cache=cache)
+        with mock.patch.object(main, '_simulate',
+                               wraps=main._simulate) as simulate:
+            forecasts = parallel.run_forecasts(self.index, args, windows,
+                                               workers=1, chunk_size=15,
+                                               cache=cache)
+            assert simulate.call_count == 3 * 3
+        assert forecasts == expected
+
+        folder = os.path.join(self.tmp.name, 'forecasts')
+        for _ in range(2):
+            paths = parallel.run_forecasts(self.index,
+                                           {**args, 'output_format': 'npy'},
+                                           windows, workers=2, folder=folder,
+                                           cache=cache)
+        expected = parallel.run_forecasts(self.index, args, windows,
+                                          workers=1, as_catalog=True)
+        for path, forecast in zip(paths, expected):
+            assert libs.load_forecast(path).to_list() == forecast.to_list()
+
+    def test_eviction(self):
+        cache = ResultCache(self.tmp.name, max_bytes=0)
+        forecasts = []
+        for n, seed in enumerate((1, 2, 3)):
+            key = cache.key(self.index, self.args, 200, seed)
+            forecast = main.make_forecast(self.index, self.args, 200,
+                                          seed=seed, verbose=False,
+                                          as_catalog=True)
+            cache.put(key, forecast)
+            forecasts.append((key, forecast))
+        assert cache.size() == 0
+
+        cache.max_bytes = 10 ** 7
+        for key, forecast in forecasts:
+            cache.put(key, forecast)
+        first = cache.path(forecasts[0][0])
+        os.utime(first, ns=(0, 0))
+        assert cache.get(forecasts[0][0]).to_list() == \
+            forecasts[0][1].to_list()
+        sizes = [os.path.getsize(cache.path(i[0])) for i in forecasts]
+
+        # The least recently used forecast (the second) is evicted first
+        os.utime(cache.path(forecasts[2][0]), ns=(4 * 10 ** 18, 4 * 10 ** 18))
+        cache.max_bytes = sum(sizes) - 1
+        cache.evict()
+        assert [os.path.isfile(cache.path(i[0])) for i in forecasts] == \
+            [True, False, True]
+        assert cache.get(forecasts[1][0]) is None
+        numpy.testing.assert_equal(cache.size(), sizes[0] + sizes[2])
+
+        # The folder is rescanned only once it exceeds max_bytes
+        cache = ResultCache(self.tmp.name, max_bytes=sum(sizes))
+        with mock.patch.object(cache, 'evict', wraps=cache.evict) as evict:
+            cache.put(forecasts[0][0], forecasts[0][1])
+            evict.assert_not_called()
+            cache.put(forecasts[1][0], forecasts[1][1])
+            evict.assert_not_called()
+            cache.max_bytes -= 1
+            cache.put(forecasts[1][0], forecasts[1][1])
+            evict.assert_called_once()
+        assert cache.size() < sum(sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy
+
+from pymock import libs, main
+from pymock.server import ForecastServer
+
+current_dir = os.path.dirname(__file__)
+cat_file = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog = os.path.join(self.tmp.name, 'catalog.csv')
+        shutil.copy(cat_file, self.catalog)
+        self.args_path = os.path.join(self.tmp.name, 'args.txt')
+        with open(self.args_path, 'w') as f_:
+            f_.write('start_date = 2016-11-05T03:22:31\n'
+                     'end_date = 2016-11-06T03:22:30\n'
+                     'catalog = catalog.csv\n'
+                     'n_sims = 500\n'
+                     'seed = 3\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stdio(self):
+        folder = os.path.join(self.tmp.name, 'forecasts')
+        requests = [
+            {'id': 1, 'args_path': self.args_path},
+            {'id': 2, 'args': {'start_date': '2009-04-06',
+                               'end_date': '2009-04-07',
+                               'catalog': 'catalog.csv', 'mag_min': '3.5',
+                               'n_sims': 100, 'seed': 1},
+             'base_dir': self.tmp.name},
+            {'id': 3, 'args': {'start_date': '2009-04-06'}},
+        ]
+        stdin = io.StringIO('\n'.join(json.dumps(i) for i in requests) +
+                            '\nnot json\n')
+        stdout = io.StringIO()
+        server = ForecastServer([self.catalog], workers=2, folder=folder)
+        server.serve_stdio(stdin, stdout)
+
+        responses = [json.loads(i) for i in stdout.getvalue().splitlines()]
+        assert len(responses) == 4
+        responses = {i.get('id'): i for i in responses}
+        assert responses[1]['status'] == 'ok'
+        assert responses[2]['status'] == 'ok'
+        assert responses[3]['status'] == 'error'
+        assert responses[None]['status'] == 'error'
+        assert len(server._stores) == 1  # catalog loaded only once
+
+        forecast = libs.load_forecast(responses[1]['path'])
+        assert len(forecast) == responses[1]['n_events']
+        assert forecast.catalog_id.max() < 500
+
+        # Same forecast as a run from the args file
+        main_folder = os.path.join(self.tmp.name, 'main')
+        main.main(self.args_path, main_folder)
+        with open(responses[1]['path']) as a, \
+                open(os.path.join(main_folder,
+                                  os.path.basename(responses[1]['path']))) \
+                as b:
+            assert a.read() == b.read()
+
+    def test_entry_point(self):
+        # The log of the forecasts goes to stderr, stdout only has responses
+        folder = os.path.join(self.tmp.name, 'forecasts')
+        requests = [{'id': 1, 'args_path': self.args_path},
+                    {'id': 2, 'args': {'start_date': '2009-04-06'}}]
+        result = subprocess.run(
+            [sys.executable, '-m', 'pymock.server', '--folder', folder],
+            input=''.join(json.dumps(i) + '\n' for i in requests),
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(current_dir))
+        responses = [json.loads(i) for i in result.stdout.splitlines()]
+        assert sorted(i['status'] for i in responses) == ['error', 'ok']
+        assert 'Total of' in result.stderr
+
+    def test_region_and_refresh(self):
+        with open(os.path.join(self.tmp.name, 'region'), 'w') as f_:
+            f_.write('12 41\n14 41\n14 43\n12 43\n')
+        with open(self.args_path, 'a') as f_:
+            f_.write('region = region\nregion_dh = 0.5\n')
+        folder = os.path.join(self.tmp.name, 'forecasts')
+        server = ForecastServer(workers=1, folder=folder)
+        response = server.forecast({'args_path': self.args_path})
+        grid = os.path.splitext(response['path'])[0] + '_grid.dat'
+        # Every cell and magnitude bin of the region, for CSEP readers
+        assert len(numpy.loadtxt(grid)) == 16 * 40
+
+        # Rows appended to the catalog file are ingested by the next request
+        n_events = len(server.get_index(self.catalog))
+        with open(self.catalog) as f_:
+            rows = f_.readlines()[-3:]
+        with open(self.catalog, 'a') as f_:
+            f_.writelines(rows)
+        server.forecast({'args_path': self.args_path})
+        assert len(server.get_index(self.catalog)) == n_events + 3
+
+    def test_tcp(self):
+        server = ForecastServer(workers=1, folder=self.tmp.name)
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        thread = threading.Thread(target=server.serve_tcp,
+                                  args=('127.0.0.1', port), daemon=True)
+        thread.start()
+
+        for _ in range(100):
+            try:
+                conn = socket.create_connection(('127.0.0.1', port))
+                break
+            except OSError:
+                threading.Event().wait(0.05)
+        with conn:
+            conn.sendall((json.dumps({'id': 'a', 'args_path':
+                                      self.args_path}) + '\n').encode())
+            conn.shutdown(socket.SHUT_WR)
+            response = json.loads(conn.makefile().readline())
+        assert response['status'] == 'ok'
+        assert os.path.isfile(response['path'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from pymock import libs
+from pymock.store import CatalogStore
+
+current_dir = os.path.dirname(__file__)
+catalog_path = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestStore(unittest.TestCase):
+
+    def test_refresh(self):
+        with open(catalog_path) as f_:
+            lines = f_.readlines()
+        catalog = libs.load_catalog(catalog_path, cache=False)
+        expected = catalog.to_list()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'catalog.csv')
+            with open(path, 'w') as f_:
+                f_.writelines(lines[:-50])
+            store = CatalogStore(path)
+            assert store.refresh() == 0
+
+            # New rows, one of them not yet complete
+            with open(path, 'a') as f_:
+                f_.writelines(lines[-50:-20])
+                f_.write(lines[-20][:10])
+            old = store.index
+            old_counts = [len(old.subset(i)) for i in (None, 3.0)]
+            assert store.refresh() == 30
+            # The previous index is left as it was, for its readers
+            assert [len(old.subset(i)) for i in (None, 3.0)] == old_counts
+            assert len(store.index) == len(old) + 30
+            with open(path, 'a') as f_:
+                f_.write(lines[-20][10:])
+            assert store.refresh() == 1
+
+            # Delta file
+            delta = os.path.join(tmp, 'delta.csv')
+            with open(delta, 'w') as f_:
+                f_.writelines(lines[:1] + lines[-19:])
+            assert store.append(delta) == 19
+            assert store.catalog.to_list() == catalog.sort().to_list()
+            assert libs.load_catalog(path).to_list() == expected
+
+            # Modified file is loaded again
+            with open(path, 'w') as f_:
+                f_.writelines(lines[:101])
+            assert store.refresh() is None
+            assert len(store) == 100
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from pymock import libs
+from pymock.parallel import run_forecasts
+from pymock.sweep import run_sweep, sweep_variants
+
+current_dir = os.path.dirname(__file__)
+arg_file = os.path.join(current_dir, 'artifacts', 'args_test.txt')
+cat_file = os.path.join(current_dir, 'artifacts', 'iside_tests')
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_variants(self):
+        variants = sweep_variants({'mag_min': [3.5, 4.0],
+                                   'distribution': ['poisson', 'negbinom']})
+        assert len(variants) == 4
+        assert variants[1] == {'mag_min': 3.5, 'distribution': 'negbinom'}
+
+    def test_sweep(self):
+        catalog = libs.load_catalog(cat_file, cache=False)
+        args = libs.read_args(arg_file)
+        grid = {'mag_min': [3.0, 4.0], 'lookback_days': [1, 7]}
+        windows = libs.forecast_windows(datetime(2016, 11, 1),
+                                        datetime(2016, 11, 4))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = run_sweep(catalog, args, grid, windows, n_sims=50,
+                                 seed=3, folder=tmp)
+            with open(os.path.join(tmp, 'manifest.json')) as f_:
+                assert json.load(f_) == manifest
+            assert len(manifest['variants']) == 4
+            forecasts = {}
+            for variant in manifest['variants']:
+                assert len(variant['files']) == 3
+                forecasts[variant['name']] = [
+                    libs.load_forecast(os.path.join(tmp, i)).to_list()
+                    for i in variant['files']]
+
+            # Same forecasts as the variants' own runs
+            variant = manifest['variants'][3]
+            assert variant['params'] == {'mag_min': 4.0, 'lookback_days': 7}
+            files = run_forecasts(catalog, {**args, **variant['params']},
+                                  windows, n_sims=50, seed=3, workers=1,
+                                  folder=os.path.join(tmp, 'expected'))
+            assert forecasts[variant['name']] == [
+                libs.load_forecast(i).to_list() for i in files]
+
+            # Parallel sweep gives identical results
+            parallel_dir = os.path.join(tmp, 'parallel')
+            run_sweep(catalog, args, grid, windows, n_sims=50, seed=3,
+                      folder=parallel_dir, workers=2)
+            for variant in manifest['variants']:
+                assert forecasts[variant['name']] == [
+                    libs.load_forecast(os.path.join(parallel_dir, i)).to_list()
+                    for i in variant['files']]
+
+
+if __name__ == '__main__':
+    unittest.main()
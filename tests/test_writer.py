@@ -1,6 +1,10 @@
+import numpy
+import gzip
 import os
+import tempfile
 import unittest
 from pymock import libs
+from pymock.catalog import Catalog
 from datetime import datetime
 
 # Get test file path
@@ -40,6 +44,107 @@ class TestMain(unittest.TestCase):
         date_event = data[2].split(',')[3]
         assert datetime.fromisoformat(date_event) == forecast[1][3]
 
+    def test_catwrite_chunks(self):
+        start = datetime(2022, 10, 1)
+        end = datetime(2022, 10, 2)
+        forecast = Catalog([123.12, -38.24, 60.908],
+                           [-74.52, -73.05, -147.339],
+                           [1.5, 9.5, 9.2], [0, 1000, 1500000],
+                           [10, 33, 25], [0, 1, 1], [0, 0, 1])
+        with tempfile.TemporaryDirectory() as folder:
+            libs.write_forecast(start, end, forecast, folder)
+            with open(libs.syncat_path(start, end, folder)) as file_:
+                data = file_.read()
+
+            # A stream of chunks is written as a single forecast
+            chunks = (i for i in (forecast[:1], forecast[1:2].to_list(),
+                                  forecast[2:]))
+            libs.write_forecast(start, end, chunks, folder)
+            with open(libs.syncat_path(start, end, folder)) as file_:
+                assert file_.read() == data
+
+        assert data.splitlines()[1] == \
+            '123.12,-74.52,1.50,1970-01-01T00:00:00,10.0,0,0'
+
+    def test_format_csv(self):
+        forecast = Catalog([0.0, -0.0, 13.297, 1e-05, 13.297],
+                           [42.82, 42.82, -0.1, 1e16, 0.30000000000000004],
+                           [4.005, 4.3999999999999995, 2.0, 8.0, 4.4],
+                           [0, 1, -1, 1478316151759566, -86400000000],
+                           [10.0, 10.0, 0.0, 5.5, 33.0],
+                           [0, 0, 1, 2, 1000], [0, 1, 0, 0, 0])
+        expected = ''.join(
+            f'{i[0]},{i[1]},{i[2]:.2f},{i[3].isoformat()},{i[4]},{i[5]},'
+            f'{i[6]}\n' for i in forecast.to_list())
+        assert libs.format_csv(forecast) == expected
+        assert libs.format_csv(forecast[:0]) == ''
+
+    def test_binary_forecast(self):
+        start = datetime(2022, 10, 1)
+        end = datetime(2022, 10, 2)
+        forecast = Catalog([123.12, -38.24, 60.908],
+                           [-74.52, -73.05, -147.339],
+                           [1.5, 9.5, 9.2], [0, 1000, 1500000],
+                           [10, 33, 25], [0, 1, 1], [0, 0, 1])
+        with tempfile.TemporaryDirectory() as folder:
+            libs.write_forecast(start, end, iter([forecast[:1], forecast[1:]]),
+                                folder, fmt='npy')
+            path = libs.syncat_path(start, end, folder, fmt='npy')
+            assert path.endswith('.npy')
+
+            # Zero-copy read
+            binary = libs.load_forecast(path)
+            assert isinstance(binary.mag.base, numpy.memmap)
+            assert binary.to_list() == forecast.to_list()
+
+            # Conversion to and from the CSEP csv
+            csv_path = libs.syncat_path(start, end, folder)
+            libs.convert_forecast(path, csv_path)
+            assert libs.load_forecast(csv_path).to_list() == \
+                forecast.to_list()
+            libs.convert_forecast(csv_path, os.path.join(folder, 'copy.npy'))
+            with open(path, 'rb') as a, \
+                    open(os.path.join(folder, 'copy.npy'), 'rb') as b:
+                assert a.read() == b.read()
+
+    def test_compressed_forecast(self):
+        start = datetime(2022, 10, 1)
+        end = datetime(2022, 10, 2)
+        forecast = Catalog([123.12, -38.24, 60.908],
+                           [-74.52, -73.05, -147.339],
+                           [1.5, 9.5, 9.2], [0, 1000, 1500000],
+                           [10, 33, 25], [0, 1, 1], [0, 0, 1])
+        with tempfile.TemporaryDirectory() as folder:
+            libs.write_forecast(start, end, forecast, folder)
+            with open(libs.syncat_path(start, end, folder)) as file_:
+                data = file_.read()
+
+            chunks = iter([forecast[:1], forecast[1:].to_list()])
+            libs.write_forecast(start, end, chunks, folder, fmt='csv.gz',
+                                level=1)
+            path = libs.syncat_path(start, end, folder, fmt='csv.gz')
+            assert path.endswith('.csv.gz')
+            with gzip.open(path, 'rt') as file_:
+                assert file_.read() == data
+
+            # Readers detect the compression from the extension
+            assert libs.load_cat(path) == forecast.to_list()
+            assert libs.load_forecast(path).to_list() == forecast.to_list()
+
+            libs.write_forecast(start, end, iter([forecast[:1], forecast[1:]]),
+                                folder, fmt='npy.gz')
+            path = libs.syncat_path(start, end, folder, fmt='npy.gz')
+            assert libs.load_forecast(path).to_list() == forecast.to_list()
+            assert not [i for i in os.listdir(folder) if '.tmp' in i]
+
+            with self.assertRaises(ValueError):
+                libs.write_forecast(start, end, forecast, folder,
+                                    fmt='csv.bz2')
+
 
 if __name__ == '__main__':
     TestMain().test_catwrite()
+    TestMain().test_catwrite_chunks()
+    TestMain().test_format_csv()
+    TestMain().test_binary_forecast()
+    TestMain().test_compressed_forecast()